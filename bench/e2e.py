@@ -0,0 +1,447 @@
+"""
+Offline end-to-end benchmark for the notifier (livin_bot).
+
+Seeds a local PostgreSQL with contracts, contract_requests, users and
+apartment_identificator, starts a fake Telegram endpoint and the bot
+itself (as a subprocess pointed at both), then writes status transitions
+at a fixed rate and matches every delivered message back to the
+transition that caused it.
+
+Reports event-to-message latency (p50/p99), delivered messages/s, missed
+events, Telegram requests (incl. injected 429s), DB transactions per poll
+tick and, when run after 09:00 Almaty, how long the startup daily report
+took to arrive.
+
+Needs a throw-away database whose name contains "bench"; its tables are
+dropped and recreated:
+
+    createdb livin_bench
+    python bench/e2e.py --contracts 50000 --rate 20 --duration 60 --p429 0.02
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_telegram import FakeTelegram  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA_SQL = """
+DROP TABLE IF EXISTS contracts, contract_requests, users, apartment_identificator;
+
+CREATE TABLE users (
+    id uuid PRIMARY KEY,
+    "firstName" text,
+    "lastName" text,
+    phone text
+);
+
+CREATE TABLE apartment_identificator (
+    id serial PRIMARY KEY,
+    "apartmentId" uuid NOT NULL,
+    slug text,
+    "createdAt" timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE contract_requests (
+    id uuid PRIMARY KEY,
+    status text NOT NULL,
+    cost bigint,
+    "arrivalDate" timestamptz,
+    "departureDate" timestamptz,
+    "baseApartmentAdData" jsonb,
+    "tenantId" uuid,
+    "tenantInformation" jsonb,
+    "landlordInformation" jsonb,
+    "apartmentAdId" uuid,
+    "createdAt" timestamptz NOT NULL DEFAULT now(),
+    "updatedAt" timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE TABLE contracts (
+    id uuid PRIMARY KEY,
+    status text NOT NULL,
+    cost bigint,
+    "arrivalDate" timestamptz,
+    "departureDate" timestamptz,
+    "baseApartmentAdData" jsonb,
+    "tenantId" uuid,
+    "landlordId" uuid,
+    "tenantInformation" jsonb,
+    "landlordInformation" jsonb,
+    "apartmentAdId" uuid,
+    "createdAt" timestamptz NOT NULL DEFAULT now(),
+    "updatedAt" timestamptz NOT NULL DEFAULT now(),
+    "isPaymentSuccess" boolean NOT NULL DEFAULT false,
+    "payedAt" timestamptz,
+    "retryPaymentAttempts" int NOT NULL DEFAULT 0
+);
+"""
+
+# same indexes livin_bot.db asks for in REQUIRED_INDEXES
+INDEXES_SQL = """
+CREATE INDEX contracts_paid_payed_at_idx ON contracts ("payedAt")
+    WHERE status = 'CONCLUDED' AND "isPaymentSuccess" = true;
+CREATE INDEX contracts_paid_arrival_date_idx ON contracts ("arrivalDate")
+    WHERE status = 'CONCLUDED' AND "isPaymentSuccess" = true;
+CREATE INDEX contracts_timers_departure_date_idx ON contracts ("departureDate")
+    WHERE "isPaymentSuccess" = true AND status IN ('CONCLUDED', 'COMPLETED');
+CREATE INDEX contracts_timers_arrival_date_idx ON contracts ("arrivalDate")
+    WHERE "isPaymentSuccess" = true AND status IN ('CONCLUDED', 'COMPLETED');
+CREATE INDEX contracts_updated_at_id_idx ON contracts ("updatedAt", id);
+CREATE INDEX contract_requests_updated_at_id_idx ON contract_requests ("updatedAt", id);
+CREATE INDEX apartment_identificator_apartment_idx ON apartment_identificator ("apartmentId", "createdAt");
+"""
+
+# one in ten people has incomplete JSON, to exercise the users fallback
+PERSON_SQL = """
+CASE WHEN g %% 10 = 0 THEN '{{}}'::jsonb
+     ELSE jsonb_build_object('firstName', '{first}', 'lastName', g::text, 'phoneNumber', '+7700' || g)
+END
+"""
+
+AD_SQL = """
+jsonb_build_object(
+    'title', 'Bench#{prefix}' || g,
+    'address', jsonb_build_object('city', (ARRAY['Алматы', 'Астана', 'Шымкент'])[1 + g %% 3])
+)
+"""
+
+SEED_SQL = f"""
+INSERT INTO users (id, "firstName", "lastName", phone)
+SELECT md5('user' || g)::uuid, 'User', g::text, '+7701' || g
+FROM generate_series(1, %(users)s) g;
+
+INSERT INTO apartment_identificator ("apartmentId", slug)
+SELECT md5('apt' || g)::uuid, 'bench-apartment-' || g
+FROM generate_series(1, %(apartments)s) g;
+
+INSERT INTO contract_requests
+    (id, status, cost, "arrivalDate", "departureDate", "baseApartmentAdData", "tenantId",
+     "tenantInformation", "landlordInformation", "apartmentAdId", "createdAt", "updatedAt")
+SELECT md5('request' || g)::uuid,
+       (ARRAY['CREATED', 'ACCEPTED', 'REJECTED'])[1 + g %% 3],
+       (30000 + g %% 200 * 500) * 100,
+       now() - interval '300 days' + (g %% 330) * interval '1 day',
+       now() - interval '297 days' + (g %% 330) * interval '1 day',
+       {AD_SQL.format(prefix='R')},
+       md5('user' || (1 + g %% %(users)s))::uuid,
+       {PERSON_SQL.format(first='Гость')},
+       {PERSON_SQL.format(first='Хозяин')},
+       md5('apt' || (1 + g %% %(apartments)s))::uuid,
+       now() - interval '301 days' + (g %% 330) * interval '1 day',
+       now() - interval '1 hour' - g * interval '1 millisecond'
+FROM generate_series(1, %(requests)s) g;
+
+INSERT INTO contracts
+    (id, status, cost, "arrivalDate", "departureDate", "baseApartmentAdData", "tenantId", "landlordId",
+     "tenantInformation", "landlordInformation", "apartmentAdId", "createdAt", "updatedAt",
+     "isPaymentSuccess", "payedAt", "retryPaymentAttempts")
+SELECT md5('contract' || g)::uuid,
+       s.status,
+       (30000 + g %% 200 * 500) * 100,
+       now() - interval '400 days' + (g %% 420) * interval '1 day',
+       now() - interval '397 days' + (g %% 420) * interval '1 day',
+       {AD_SQL.format(prefix='C')},
+       md5('user' || (1 + g %% %(users)s))::uuid,
+       md5('user' || (1 + (g * 7) %% %(users)s))::uuid,
+       {PERSON_SQL.format(first='Гость')},
+       {PERSON_SQL.format(first='Хозяин')},
+       md5('apt' || (1 + g %% %(apartments)s))::uuid,
+       now() - interval '402 days' + (g %% 420) * interval '1 day',
+       now() - interval '1 hour' - g * interval '1 millisecond',
+       s.status IN ('CONCLUDED', 'COMPLETED') AND g %% 4 <> 0,
+       CASE WHEN s.status IN ('CONCLUDED', 'COMPLETED') AND g %% 4 <> 0
+            THEN now() - interval '401 days' + (g %% 420) * interval '1 day' END,
+       0
+FROM generate_series(1, %(contracts)s) g,
+     LATERAL (SELECT (ARRAY['CREATED', 'CONCLUDED', 'CONCLUDED', 'COMPLETED', 'REJECTED'])[1 + g %% 5] AS status) s;
+
+ANALYZE;
+"""
+
+# Generator states. Consecutive states always differ in the bot's mark,
+# so every transition must produce exactly one message.
+CONTRACT_STATES = [
+    ("CREATED", False, False, 0),
+    ("CONCLUDED", False, False, 0),   # 💥 Оплата не прошла
+    ("CONCLUDED", False, False, 1),   # 💥 Повторная оплата не прошла
+    ("CONCLUDED", True, True, 1),     # 💳 Бронь оплачена
+    ("FREEZE", True, True, 1),
+    ("REJECTED", True, True, 1),
+]
+REQUEST_STATES = ["CREATED", "ACCEPTED", "REJECTED"]
+
+# an event message names the apartment on its "🏠" line; report rows do not
+EVENT_RE = re.compile(r"^🏠 (?:Квартира: <b>)?Bench#([CR]\d+)", re.MULTILINE)
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = max(0, min(len(values) - 1, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def db_xacts(conn) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_stat_clear_snapshot()")
+        cur.execute(
+            "SELECT xact_commit + xact_rollback FROM pg_stat_database WHERE datname = current_database()"
+        )
+        return cur.fetchone()[0]
+
+
+def seed(conn, args):
+    t0 = time.monotonic()
+    with conn.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+        cur.execute(SEED_SQL, {
+            "users": args.users,
+            "apartments": args.apartments,
+            "requests": args.requests,
+            "contracts": args.contracts,
+        })
+        if not args.no_indexes:
+            cur.execute(INDEXES_SQL)
+    print(f"seeded {args.contracts} contracts / {args.requests} requests in {time.monotonic() - t0:.1f}s")
+
+
+def claim_rows(conn, pool_size):
+    """Parks a pool of rows in a state that produces no message, before the bot starts."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            UPDATE contracts SET status = 'OFFERING', "updatedAt" = now() - interval '30 minutes'
+            WHERE id IN (SELECT md5('contract' || g)::uuid FROM generate_series(1, %s) g)
+            RETURNING id, "baseApartmentAdData"->>'title'
+            """,
+            (pool_size,),
+        )
+        contracts = {title.split("#")[1]: (cid, -1) for cid, title in cur.fetchall()}
+        cur.execute(
+            """
+            UPDATE contract_requests SET status = 'BENCH_IDLE', "updatedAt" = now() - interval '30 minutes'
+            WHERE id IN (SELECT md5('request' || g)::uuid FROM generate_series(1, %s) g)
+            RETURNING id, "baseApartmentAdData"->>'title'
+            """,
+            (pool_size // 4,),
+        )
+        requests_ = {title.split("#")[1]: (rid, -1) for rid, title in cur.fetchall()}
+    return contracts, requests_
+
+
+class Generator:
+    """Writes transitions and remembers when each one was committed."""
+
+    def __init__(self, conn, contracts, requests_):
+        self.conn = conn
+        self.rows = {**contracts, **requests_}
+        self.lock = threading.Lock()
+        self.pending = {}      # label -> [commit times]
+        self.latencies = []
+        self.generated = 0
+        self.xacts = 0
+
+    def transition(self, label=None):
+        label = label or random.choice(list(self.rows))
+        row_id, state = self.rows[label]
+        with self.conn.cursor() as cur:
+            if label.startswith("C"):
+                state = (state + 1) % len(CONTRACT_STATES)
+                status, success, paid, retries = CONTRACT_STATES[state]
+                cur.execute(
+                    """
+                    UPDATE contracts
+                    SET status = %s, "isPaymentSuccess" = %s,
+                        "payedAt" = CASE WHEN %s THEN now() END,
+                        "retryPaymentAttempts" = %s, "updatedAt" = clock_timestamp()
+                    WHERE id = %s
+                    """,
+                    (status, success, paid, retries, row_id),
+                )
+            else:
+                state = (state + 1) % len(REQUEST_STATES)
+                cur.execute(
+                    'UPDATE contract_requests SET status = %s, "updatedAt" = clock_timestamp() WHERE id = %s',
+                    (REQUEST_STATES[state], row_id),
+                )
+        committed = time.time()
+        with self.lock:
+            self.rows[label] = (row_id, state)
+            self.pending.setdefault(label, []).append(committed)
+            self.generated += 1
+            self.xacts += 1
+        return label
+
+    def on_message(self, arrival, chat_id, text):
+        m = EVENT_RE.search(text)
+        if not m:
+            return
+        with self.lock:
+            times = self.pending.get(m.group(1))
+            if times:
+                self.latencies.append(arrival - times.pop(0))
+
+    def missed(self) -> int:
+        with self.lock:
+            return sum(len(t) for t in self.pending.values())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-host", default=os.getenv("BENCH_DB_HOST", "localhost"))
+    ap.add_argument("--db-port", default=os.getenv("BENCH_DB_PORT", "5432"))
+    ap.add_argument("--db-name", default=os.getenv("BENCH_DB_NAME", "livin_bench"))
+    ap.add_argument("--db-user", default=os.getenv("BENCH_DB_USER", "postgres"))
+    ap.add_argument("--db-password", default=os.getenv("BENCH_DB_PASSWORD", "postgres"))
+    ap.add_argument("--contracts", type=int, default=50000)
+    ap.add_argument("--requests", type=int, default=20000)
+    ap.add_argument("--users", type=int, default=20000)
+    ap.add_argument("--apartments", type=int, default=5000)
+    ap.add_argument("--pool", type=int, default=2000, help="rows the generator cycles through")
+    ap.add_argument("--rate", type=float, default=10, help="transitions per second")
+    ap.add_argument("--duration", type=float, default=60, help="seconds of load")
+    ap.add_argument("--drain", type=float, default=30, help="max seconds to wait for stragglers")
+    ap.add_argument("--latency-ms", type=float, default=0, help="fake Telegram latency")
+    ap.add_argument("--p429", type=float, default=0.0, help="share of Telegram calls answered 429")
+    ap.add_argument("--check-interval", type=int, default=2,
+                    help="poll interval; pinned, so xacts per tick stay comparable between runs")
+    ap.add_argument("--mode", choices=["poll", "push"], default="poll")
+    ap.add_argument("--no-seed", action="store_true", help="reuse the already seeded tables")
+    ap.add_argument("--no-indexes", action="store_true", help="seed without the recommended indexes")
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args()
+
+    if "bench" not in args.db_name:
+        sys.exit(f"refusing to use database {args.db_name!r}: its tables get dropped; use a *bench* database")
+
+    dsn = (
+        f"host={args.db_host} port={args.db_port} dbname={args.db_name} "
+        f"user={args.db_user} password={args.db_password}"
+    )
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+
+    if not args.no_seed:
+        seed(conn, args)
+    contracts, requests_ = claim_rows(conn, args.pool)
+    gen = Generator(conn, contracts, requests_)
+
+    stub = FakeTelegram(latency_ms=args.latency_ms, p429=args.p429).start()
+    stub.on_message = gen.on_message
+
+    workdir = tempfile.mkdtemp(prefix="livin-bench-")
+    log_path = os.path.join(workdir, "bot.log")
+    env = dict(
+        os.environ,
+        DB_HOST=args.db_host,
+        DB_PORT=str(args.db_port),
+        DB_NAME=args.db_name,
+        DB_USER=args.db_user,
+        DB_PASSWORD=args.db_password,
+        TELEGRAM_BOT_TOKEN="bench",
+        TELEGRAM_CHAT_IDS="1",
+        TELEGRAM_API_URL=stub.url,
+        CHECK_INTERVAL=str(args.check_interval),
+        POLL_MIN_INTERVAL=str(args.check_interval),
+        POLL_MAX_INTERVAL=str(args.check_interval),
+        # seeded dates are spread over months: reminders would only add noise
+        TIMER_EVENTS="",
+        NOTIFY_MODE=args.mode,
+        CHECKPOINT_PATH=os.path.join(workdir, "checkpoints.sqlite3"),
+        PYTHONUNBUFFERED="1",
+    )
+    started = time.time()
+    with open(log_path, "w") as log:
+        bot = subprocess.Popen([sys.executable, "-m", "livin_bot"], cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        # warm-up: repeat a probe transition until the bot delivers it
+        probe = next(iter(contracts))
+        deadline = time.time() + 60
+        while time.time() < deadline and not gen.latencies:
+            gen.transition(probe)
+            time.sleep(max(1.0, args.check_interval))
+        if not gen.latencies:
+            sys.exit(f"bot never delivered the warm-up event, see {log_path}")
+        ready = time.time() - started
+        with gen.lock:
+            gen.pending.clear()
+            gen.latencies.clear()
+            gen.generated = 0
+            gen.xacts = 0
+        sent_before = len(stub.messages)
+
+        xacts_start = db_xacts(conn)
+        t0 = time.time()
+        for i in range(int(args.rate * args.duration)):
+            delay = t0 + i / args.rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            gen.transition()
+        load_end = time.time()
+
+        drain_deadline = load_end + args.drain
+        while gen.missed() and time.time() < drain_deadline:
+            time.sleep(0.2)
+        end = time.time()
+        time.sleep(1)  # let the stats collector catch up
+        xacts = db_xacts(conn) - xacts_start - gen.xacts - 2
+    finally:
+        bot.terminate()
+        try:
+            bot.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        stub.stop()
+
+    report_first = None
+    for arrival, _, text in stub.messages:
+        if "Ежедневная сводка" in text:
+            report_first = arrival - started
+            break
+
+    ticks = max(1.0, (end - t0) / args.check_interval)
+    delivered = len(gen.latencies)
+    results = {
+        "events_generated": gen.generated,
+        "events_delivered": delivered,
+        "events_missed": gen.missed(),
+        "latency_p50_ms": round(percentile(gen.latencies, 50) * 1000, 1),
+        "latency_p99_ms": round(percentile(gen.latencies, 99) * 1000, 1),
+        "messages_per_s": round((len(stub.messages) - sent_before) / max(end - t0, 1e-9), 2),
+        "telegram_requests": stub.requests,
+        "telegram_429_injected": stub.rejected_429,
+        "db_xacts_per_tick": round(xacts / ticks, 2) if args.mode == "poll" else None,
+        "bot_ready_s": round(ready, 2),
+        "report_first_chunk_s": round(report_first, 2) if report_first is not None else None,
+        "bot_log": log_path,
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print()
+    print(f"mode={args.mode} rate={args.rate}/s duration={args.duration}s check_interval={args.check_interval}s")
+    for key, value in results.items():
+        print(f"  {key:<24} {value}")
+    if report_first is None and datetime.now(pytz.timezone("Asia/Almaty")).hour < 9:
+        print("  (daily report is only sent on startup after 09:00 Almaty)")
+
+
+if __name__ == "__main__":
+    main()
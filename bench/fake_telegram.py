@@ -0,0 +1,117 @@
+"""
+Local stand-in for the Telegram Bot API sendMessage endpoint.
+
+Records every accepted message with its arrival time and can inject
+latency and 429 responses (with parameters.retry_after), so the bot's
+sender can be exercised offline.
+
+Standalone:  python bench/fake_telegram.py --port 8081 --latency-ms 50 --p429 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+
+class FakeTelegram:
+    def __init__(self, port: int = 0, latency_ms: float = 0, p429: float = 0.0, retry_after: int = 1):
+        self.latency_ms = latency_ms
+        self.p429 = p429
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.messages: List[Tuple[float, int, str]] = []  # (arrival time, chat_id, text)
+        self.requests = 0
+        self.rejected_429 = 0
+        self.on_message = None  # optional callback(arrival, chat_id, text)
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                stub._handle(self, body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _reply(self, handler, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _handle(self, handler, body: bytes):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        with self.lock:
+            self.requests += 1
+            flood = self.p429 and random.random() < self.p429
+            if flood:
+                self.rejected_429 += 1
+
+        if flood:
+            self._reply(handler, 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            })
+            return
+
+        try:
+            msg = json.loads(body or b"{}")
+        except ValueError:
+            self._reply(handler, 400, {"ok": False, "error_code": 400, "description": "Bad Request"})
+            return
+
+        arrival = time.time()
+        chat_id, text = msg.get("chat_id"), msg.get("text") or ""
+        with self.lock:
+            self.messages.append((arrival, chat_id, text))
+        if self.on_message:
+            self.on_message(arrival, chat_id, text)
+
+        self._reply(handler, 200, {"ok": True, "result": {"message_id": len(self.messages), "chat": {"id": chat_id}}})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake Telegram sendMessage endpoint")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency-ms", type=float, default=0)
+    ap.add_argument("--p429", type=float, default=0.0, help="share of requests answered with 429")
+    ap.add_argument("--retry-after", type=int, default=1)
+    args = ap.parse_args()
+
+    stub = FakeTelegram(args.port, args.latency_ms, args.p429, args.retry_after)
+    stub.on_message = lambda t, chat_id, text: print(f"{t:.3f} chat={chat_id} {text.splitlines()[0][:80]}")
+    print(f"Fake Telegram listening on {stub.url}")
+    stub.server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
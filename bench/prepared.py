@@ -0,0 +1,160 @@
+"""
+Micro-benchmark of one busy feed tick: plain-text queries with tuple rows
+(the old path) against the prepared statements and row records of
+livin_bot.dal.
+
+A tick is the change probe plus one full page of each feed. Reports per
+tick: wall time, client CPU (query round trips and row decoding) and the
+server's planning time, the latter from EXPLAIN (ANALYZE) of the same
+statements.
+
+Uses the tables bench/e2e.py seeds (pass --seed to create them):
+
+    python bench/prepared.py --ticks 500 --seed
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from livin_bot.dal import ContractRow, RequestRow, Statement, feed_contracts, feed_requests  # noqa: E402
+from livin_bot.feed import CHANGE_PROBE_SQL  # noqa: E402
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def tick_params(limit):
+    page = {"ts": EPOCH, "id": None, "limit": limit, "shards": 1, "shard": 0}
+    probe = {"contract_requests_ts": EPOCH, "contract_requests_id": None,
+             "contracts_ts": EPOCH, "contracts_id": None, "shards": 1, "shard": 0}
+    return probe, page
+
+
+def text_tick(cur, probe, page):
+    cur.execute(CHANGE_PROBE_SQL, probe)
+    cur.fetchone()
+    rows = 0
+    for stmt in (feed_requests, feed_contracts):
+        cur.execute(stmt.sql, page)
+        for row in cur.fetchall():
+            row[0], row[1], row[-1]  # what a handler reads first
+            rows += 1
+    return rows
+
+
+def prepared_tick(cur, probe_stmt, probe, page):
+    probe_stmt.execute(cur, probe)
+    cur.fetchone()
+    rows = 0
+    for stmt in (feed_requests, feed_contracts):
+        for row in stmt.fetch(cur, page):
+            row.id, row.status, row.updated_at
+            rows += 1
+    return rows
+
+
+def planning_ms(cur, sql, params) -> float:
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+    return cur.fetchone()[0][0]["Planning Time"]
+
+
+def run(cur, label, tick, ticks):
+    for _ in range(5):  # warm-up; also lets the server settle on a generic plan
+        tick()
+    walls, cpus = [], []
+    rows = 0
+    for _ in range(ticks):
+        w0, c0 = time.perf_counter(), time.process_time()
+        rows = tick()
+        cpus.append((time.process_time() - c0) * 1000)
+        walls.append((time.perf_counter() - w0) * 1000)
+    return {
+        "mode": label,
+        "rows_per_tick": rows,
+        "wall_ms_p50": statistics.median(walls),
+        "cpu_ms_mean": statistics.mean(cpus),
+    }
+
+
+def decode_us(limit, repeat=200):
+    """Client-side cost of turning a page of tuples into records (per page)."""
+    contract = tuple(range(len(ContractRow.__slots__)))
+    request = tuple(range(len(RequestRow.__slots__)))
+    page = [contract] * limit + [request] * limit
+    t0 = time.process_time()
+    for _ in range(repeat):
+        [ContractRow(*r) for r in page[:limit]]
+        [RequestRow(*r) for r in page[limit:]]
+    return (time.process_time() - t0) / repeat * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--db-host", default=os.getenv("BENCH_DB_HOST", "localhost"))
+    ap.add_argument("--db-port", default=os.getenv("BENCH_DB_PORT", "5432"))
+    ap.add_argument("--db-name", default=os.getenv("BENCH_DB_NAME", "livin_bench"))
+    ap.add_argument("--db-user", default=os.getenv("BENCH_DB_USER", "postgres"))
+    ap.add_argument("--db-password", default=os.getenv("BENCH_DB_PASSWORD", "postgres"))
+    ap.add_argument("--ticks", type=int, default=500)
+    ap.add_argument("--batch", type=int, default=int(os.getenv("POLL_BATCH_SIZE", 200)),
+                    help="rows per feed page (POLL_BATCH_SIZE)")
+    ap.add_argument("--seed", action="store_true", help="create and fill the tables like bench/e2e.py")
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args()
+
+    conn = psycopg2.connect(
+        f"host={args.db_host} port={args.db_port} dbname={args.db_name} "
+        f"user={args.db_user} password={args.db_password}"
+    )
+    conn.autocommit = True
+
+    if args.seed:
+        if "bench" not in args.db_name:
+            sys.exit(f"refusing to seed {args.db_name!r}: its tables get dropped; use a *bench* database")
+        import e2e
+
+        e2e.seed(conn, argparse.Namespace(
+            users=20000, apartments=5000, requests=20000, contracts=50000, no_indexes=False,
+        ))
+
+    probe, page = tick_params(args.batch)
+    probe_stmt = Statement("change_probe", CHANGE_PROBE_SQL)
+    with conn.cursor() as cur:
+        text = run(cur, "text", lambda: text_tick(cur, probe, page), args.ticks)
+        prepared = run(cur, "prepared", lambda: prepared_tick(cur, probe_stmt, probe, page), args.ticks)
+
+        for result, statements in (
+            (text, [(CHANGE_PROBE_SQL, probe), (feed_requests.sql, page), (feed_contracts.sql, page)]),
+            (prepared, [(s.execute_sql, [params[p] for p in s.params])
+                        for s, params in ((probe_stmt, probe), (feed_requests, page), (feed_contracts, page))]),
+        ):
+            samples = [sum(planning_ms(cur, sql, params) for sql, params in statements) for _ in range(20)]
+            result["planning_ms_p50"] = statistics.median(samples)
+
+    results = [text, prepared]
+    decode = decode_us(args.batch)
+    if args.json:
+        print(json.dumps({"ticks": results, "decode_us_per_page": decode}, indent=2))
+        return
+
+    print(f"{'mode':<10}{'rows/tick':>10}{'wall p50 ms':>14}{'client cpu ms':>15}{'planning ms':>13}")
+    for r in results:
+        print(f"{r['mode']:<10}{r['rows_per_tick']:>10}{r['wall_ms_p50']:>14.2f}"
+              f"{r['cpu_ms_mean']:>15.2f}{r['planning_ms_p50']:>13.3f}")
+    print(f"\nsaved per tick: {text['wall_ms_p50'] - prepared['wall_ms_p50']:.2f} ms wall, "
+          f"{text['cpu_ms_mean'] - prepared['cpu_ms_mean']:.2f} ms client CPU, "
+          f"{text['planning_ms_p50'] - prepared['planning_ms_p50']:.3f} ms planning")
+    print(f"record decoding: {decode:.0f} µs per {args.batch}+{args.batch} row page (included in client CPU)")
+
+
+if __name__ == "__main__":
+    main()
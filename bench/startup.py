@@ -0,0 +1,159 @@
+"""
+Startup-time check for the notifier; exits non-zero when a budget is missed.
+
+1. Import: `import livin_bot.app` in a fresh interpreter with an empty
+   environment must succeed within --import-budget seconds without
+   creating files or starting threads.
+2. First poll: the bot is started against a database that accepts TCP
+   connections but never answers and a Telegram stub that answers slowly.
+   Its first DB connection (the catch-up poll) must be opened within
+   --first-poll-budget seconds of process start: nothing on the startup
+   path may wait for the report, the index check or Telegram.
+
+No PostgreSQL needed:
+
+    python bench/startup.py --import-budget 1.0 --first-poll-budget 2.0
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_telegram import FakeTelegram  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_PROBE = """
+import json, os, sys, threading, time
+t0 = time.perf_counter()
+import livin_bot.app
+print(json.dumps({
+    "seconds": time.perf_counter() - t0,
+    "threads": threading.active_count(),
+    "files": os.listdir("."),
+}))
+"""
+
+
+def check_import() -> dict:
+    workdir = tempfile.mkdtemp(prefix="livin-startup-")
+    env = {"PATH": os.environ.get("PATH", ""), "PYTHONPATH": REPO_ROOT}
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=workdir, env=env, capture_output=True, text=True, timeout=60
+    )
+    if out.returncode != 0:
+        return {"error": out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+class SilentDB:
+    """TCP listener standing in for an unresponsive PostgreSQL."""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(16)
+        self.port = self.sock.getsockname()[1]
+        self.first_accept = None
+        self._held = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            if self.first_accept is None:
+                self.first_accept = time.time()
+            self._held.append(conn)  # keep it open, never answer
+
+    def close(self):
+        self.sock.close()
+        for conn in self._held:
+            conn.close()
+
+
+def check_first_poll(budget: float) -> dict:
+    db = SilentDB()
+    stub = FakeTelegram(latency_ms=5000).start()
+    workdir = tempfile.mkdtemp(prefix="livin-startup-")
+    env = dict(
+        os.environ,
+        DB_HOST="127.0.0.1",
+        DB_PORT=str(db.port),
+        DB_NAME="livin",
+        DB_USER="livin",
+        DB_PASSWORD="livin",
+        TELEGRAM_BOT_TOKEN="bench",
+        TELEGRAM_CHAT_IDS="1",
+        TELEGRAM_API_URL=stub.url,
+        CHECKPOINT_PATH=os.path.join(workdir, "checkpoints.sqlite3"),
+        METRICS_PORT="0",
+        PYTHONUNBUFFERED="1",
+    )
+    started = time.time()
+    bot = subprocess.Popen(
+        [sys.executable, "-m", "livin_bot"], cwd=REPO_ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + max(budget * 3, 5)
+        while db.first_accept is None and time.time() < deadline and bot.poll() is None:
+            time.sleep(0.01)
+    finally:
+        bot.kill()
+        bot.wait()
+        db.close()
+        stub.stop()
+    if db.first_accept is None:
+        return {"error": "no DB connection attempted" + (f" (bot exited {bot.returncode})" if bot.returncode else "")}
+    return {"seconds": db.first_accept - started}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check the notifier's startup-time budgets")
+    ap.add_argument("--import-budget", type=float, default=1.0, help="seconds to import livin_bot.app")
+    ap.add_argument("--first-poll-budget", type=float, default=2.0, help="seconds from spawn to the first poll")
+    ap.add_argument("--json", action="store_true", help="print results as JSON")
+    args = ap.parse_args()
+
+    imported = check_import()
+    polled = check_first_poll(args.first_poll_budget)
+
+    failures = []
+    if "error" in imported:
+        failures.append(f"import failed: {imported['error']}")
+    else:
+        if imported["seconds"] > args.import_budget:
+            failures.append(f"import took {imported['seconds']:.2f}s > {args.import_budget}s")
+        if imported["threads"] != 1:
+            failures.append(f"import started {imported['threads'] - 1} thread(s)")
+        if imported["files"]:
+            failures.append(f"import created files: {imported['files']}")
+    if "error" in polled:
+        failures.append(f"first poll: {polled['error']}")
+    elif polled["seconds"] > args.first_poll_budget:
+        failures.append(f"first poll after {polled['seconds']:.2f}s > {args.first_poll_budget}s")
+
+    results = {
+        "import_s": round(imported["seconds"], 3) if "seconds" in imported else None,
+        "first_poll_s": round(polled["seconds"], 3) if "seconds" in polled else None,
+        "failures": failures,
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for key, value in results.items():
+            print(f"  {key:<14} {value}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
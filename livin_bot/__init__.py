@@ -0,0 +1,7 @@
+"""
+Telegram notifier for Livin bookings: watches contract_requests/contracts
+and sends status changes plus a 09:00 daily report.
+
+Importing the package has no side effects; run it with `python -m livin_bot`
+(or the root main.py).
+"""
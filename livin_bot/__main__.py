@@ -0,0 +1,8 @@
+from dotenv import load_dotenv
+
+# before the package modules read their settings
+load_dotenv()
+
+from livin_bot.app import main  # noqa: E402
+
+main()
@@ -0,0 +1,249 @@
+"""Per-day report aggregates maintained from the change feed."""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from .checkpoints import checkpoints
+from .config import ALMATY_TZ
+from .dal import ad_columns, person_columns
+from .db import REPORT_ITERSIZE, stream_rows
+from .helpers import almaty_day_bounds, batched, extract_person, fmt_date, today_almaty
+from .lookups import get_apartment_link, resolve_apartment_links
+from .metrics import Counter
+
+
+# ===================================
+# Daily aggregates (maintained by the change feed)
+# ===================================
+
+PAID_CONTRACTS_WHERE = """
+    status = 'CONCLUDED'
+    AND "isPaymentSuccess" = true
+"""
+
+
+# full re-check of the tracked days against SQL at most this often (seconds)
+AGG_RECONCILE_INTERVAL = int(os.getenv("AGG_RECONCILE_INTERVAL", 3600))
+
+AGG_RECONCILE_SQL = f"""
+    SELECT id, cost, "payedAt", "arrivalDate", "departureDate",
+        {ad_columns('"baseApartmentAdData"')},
+        {person_columns('"tenantInformation"')},
+        {person_columns('"landlordInformation"')},
+        "apartmentAdId"
+    FROM contracts
+    WHERE {PAID_CONTRACTS_WHERE}
+      AND (("payedAt" >= %(start)s AND "payedAt" < %(end)s)
+           OR ("arrivalDate" >= %(start)s AND "arrivalDate" < %(end)s))
+"""
+
+agg_drift_total = Counter(
+    "livin_daily_agg_drift_total", "Contracts the reconciliation had to add to or drop from the daily aggregates"
+)
+
+
+class DailyAggregates:
+    """
+    What the 09:00 report needs, per Almaty date: ids of contracts paid that
+    day (bookings) and the paid contracts arriving that day, with everything
+    the report prints (payouts are yesterday's arrivals). handle_contract
+    feeds every contract change through observe(); reconcile() rebuilds the
+    tracked days (yesterday..tomorrow) from one date-bounded query, so
+    missed or sharded-away changes are corrected and the report itself
+    never has to query contracts.
+
+    Days are persisted in the checkpoint store as daily_agg:<date>.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days: Dict[str, dict] = {}   # date -> {"bookings": set, "arrivals": {id: entry}, "reconciled": ts}
+        self._placed: Dict[str, tuple] = {}  # contract id -> (booking date, arrival date)
+        self._last_reconcile = float("-inf")
+
+    @staticmethod
+    def window():
+        today = today_almaty()
+        return [(today + timedelta(days=d)).isoformat() for d in (-1, 0, 1)]
+
+    def _day(self, day: str) -> dict:
+        state = self._days.get(day)
+        if state is None:
+            stored = checkpoints.get(f"daily_agg:{day}") or {}
+            state = {
+                "bookings": set(stored.get("bookings", [])),
+                "arrivals": stored.get("arrivals", {}),
+                "reconciled": stored.get("reconciled"),
+            }
+            self._days[day] = state
+            for cid in state["bookings"]:
+                self._placed[cid] = (day, self._placed.get(cid, (None, None))[1])
+            for cid in state["arrivals"]:
+                self._placed[cid] = (self._placed.get(cid, (None, None))[0], day)
+        return state
+
+    def _save(self, day: str):
+        state = self._days[day]
+        checkpoints.set(f"daily_agg:{day}", {
+            "bookings": sorted(state["bookings"]),
+            "arrivals": dict(state["arrivals"]),  # buffered until the flush: a snapshot, not the live dict
+            "reconciled": state["reconciled"],
+        })
+
+    def _prune(self, window):
+        for day in [d for d in self._days if d not in window]:
+            state = self._days.pop(day)
+            for cid in set(state["bookings"]) | set(state["arrivals"]):
+                self._placed.pop(cid, None)
+            if day < window[0]:
+                checkpoints.delete(f"daily_agg:{day}")
+
+    def _place(self, cid: str, booking_day, arrival_day, entry, window) -> bool:
+        """Moves contract `cid` to its days; True if anything changed."""
+        old_booking, old_arrival = self._placed.get(cid, (None, None))
+        booking_day = booking_day if booking_day in window else None
+        arrival_day = arrival_day if arrival_day in window else None
+        changed = False
+
+        if old_booking != booking_day:
+            if old_booking in self._days:
+                self._days[old_booking]["bookings"].discard(cid)
+                self._save(old_booking)
+            if booking_day:
+                self._day(booking_day)["bookings"].add(cid)
+                self._save(booking_day)
+            changed = True
+
+        if old_arrival and old_arrival != arrival_day and old_arrival in self._days:
+            self._days[old_arrival]["arrivals"].pop(cid, None)
+            self._save(old_arrival)
+            changed = True
+        if arrival_day:
+            arrivals = self._day(arrival_day)["arrivals"]
+            if arrivals.get(cid) != entry:
+                arrivals[cid] = entry
+                self._save(arrival_day)
+                changed = True
+
+        if booking_day or arrival_day:
+            self._placed[cid] = (booking_day, arrival_day)
+        else:
+            self._placed.pop(cid, None)
+        return changed
+
+    @staticmethod
+    def _entry(cost, arr, dep, title, city, tenant, landlord, link) -> dict:
+        """`tenant` / `landlord`: (name, phone) as projected by dal.person_columns."""
+        tenant = extract_person(*tenant)
+        landlord = extract_person(*landlord)
+        return {
+            "title": title or "Квартира",
+            "city": city or "",
+            "tenant": [tenant["name"], tenant["phone"]],
+            "landlord": [landlord["name"], landlord["phone"]],
+            "arr": fmt_date(arr),
+            "dep": fmt_date(dep),
+            "sort": arr.isoformat() if arr else "",
+            "cost": float(cost or 0),  # numeric columns arrive as Decimal
+            "link": link,
+        }
+
+    @staticmethod
+    def _almaty_date(dt):
+        return dt.astimezone(ALMATY_TZ).date().isoformat() if dt else None
+
+    def observe(self, cur, cid, status, cost, arr, dep, title, city, tenant, landlord,
+                ap_id, is_payment_success, payed_at):
+        """Applies one contract row from the change feed."""
+        paid = status == "CONCLUDED" and bool(is_payment_success)
+        window = self.window()
+        with self._lock:
+            if not paid:
+                if cid in self._placed:
+                    self._place(cid, None, None, None, window)
+                return
+            entry = self._entry(cost, arr, dep, title, city, tenant, landlord, get_apartment_link(cur, ap_id))
+            self._place(cid, self._almaty_date(payed_at), self._almaty_date(arr), entry, window)
+
+    def reconcile(self, cur, days=None):
+        """
+        Rebuilds `days` (default: the tracked window) from SQL and reports
+        drift. Reads only contracts paid or arriving on those dates.
+        """
+        window = self.window()
+        days = sorted(days or window)
+        start, _ = almaty_day_bounds(datetime.fromisoformat(days[0]).date())
+        _, end = almaty_day_bounds(datetime.fromisoformat(days[-1]).date())
+
+        bookings: Dict[str, set] = {d: set() for d in days}
+        arrivals: Dict[str, dict] = {d: {} for d in days}
+        rows = stream_rows(cur, AGG_RECONCILE_SQL, {"start": start, "end": end}, "daily_agg_reconcile")
+        for batch in batched(rows, REPORT_ITERSIZE):
+            links = resolve_apartment_links(cur, [row[-1] for row in batch])
+            for (cid, cost, payed_at, arr, dep, title, city,
+                 tenant_name, tenant_phone, landlord_name, landlord_phone, ap_id) in batch:
+                booking_day = self._almaty_date(payed_at)
+                if booking_day in bookings:
+                    bookings[booking_day].add(cid)
+                arrival_day = self._almaty_date(arr)
+                if arrival_day in arrivals:
+                    arrivals[arrival_day][cid] = self._entry(
+                        cost, arr, dep, title, city, (tenant_name, tenant_phone),
+                        (landlord_name, landlord_phone), links.get(ap_id, ""),
+                    )
+
+        now = time.time()
+        with self._lock:
+            self._prune(window)
+            drift = 0
+            for day in days:
+                state = self._day(day)
+                drift += len(state["bookings"] ^ bookings[day])
+                drift += len(state["arrivals"].keys() ^ arrivals[day].keys())
+                for cid in state["bookings"] | state["arrivals"].keys():
+                    booking_day, arrival_day = self._placed.pop(cid, (None, None))
+                    booking_day = None if booking_day == day else booking_day
+                    arrival_day = None if arrival_day == day else arrival_day
+                    if booking_day or arrival_day:
+                        self._placed[cid] = (booking_day, arrival_day)
+                state["bookings"] = set()
+                state["arrivals"] = {}
+            for day in days:
+                state = self._days[day]
+                state["bookings"] = bookings[day]
+                state["arrivals"] = arrivals[day]
+                state["reconciled"] = now
+                for cid in bookings[day]:
+                    self._placed[cid] = (day, self._placed.get(cid, (None, None))[1])
+                for cid in arrivals[day]:
+                    self._placed[cid] = (self._placed.get(cid, (None, None))[0], day)
+                self._save(day)
+            if set(days) >= set(window):
+                self._last_reconcile = time.monotonic()
+
+        if drift:
+            agg_drift_total.inc(amount=drift)
+            print(f"Daily aggregates: reconciliation corrected {drift} contract(s) for {days[0]}..{days[-1]}")
+
+    def reconcile_if_due(self, cur):
+        with self._lock:
+            stale = any(self._day(d)["reconciled"] is None for d in self.window())
+        if stale or time.monotonic() - self._last_reconcile >= AGG_RECONCILE_INTERVAL:
+            self.reconcile(cur)
+
+    def is_reconciled(self, day: str) -> bool:
+        with self._lock:
+            return self._day(day)["reconciled"] is not None
+
+    def snapshot(self, day: str):
+        """(bookings count, arrivals sorted like the old ORDER BY "arrivalDate", id)."""
+        with self._lock:
+            state = self._day(day)
+            arrivals = sorted(state["arrivals"].items(), key=lambda kv: (kv[1]["sort"], kv[0]))
+            return len(state["bookings"]), [entry for _, entry in arrivals]
+
+
+daily_aggregates = DailyAggregates()
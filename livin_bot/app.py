@@ -0,0 +1,237 @@
+"""Entry point: wires the tasks together and runs the event loop."""
+
+import asyncio
+import atexit
+import signal
+import sys
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from .checkpoints import checkpoints
+from .config import (
+    ALMATY_TZ,
+    CHECK_INTERVAL,
+    LEADER_RETRY_INTERVAL,
+    NOTIFY_MODE,
+    POLL_MAX_INTERVAL,
+    POLL_MIN_INTERVAL,
+    PUSH_FALLBACK_INTERVAL,
+    PUSH_INSTALL_TRIGGERS,
+    SHARD_INDEX,
+    validate,
+)
+from .db import check_indexes, db_pool, replica_pool, with_db
+from .feed import poll_once, timers
+from .ha import leader
+from .metrics import (
+    PROFILER_ENABLED,
+    SamplingProfiler,
+    loop_seconds,
+    profile_requested,
+    start_metrics_server,
+)
+from .push import install_notify_triggers, open_listen_connection
+from .report import daily_report_once
+from .routing import router
+from .runtime import (
+    POLL_TIMEOUT,
+    REPORT_TIMEOUT,
+    SHUTDOWN_DRAIN_TIMEOUT,
+    bind_loop,
+    run_blocking,
+    spawn_blocking,
+)
+from .telegram import outbound
+
+
+# ===================================
+# Main loop
+# ===================================
+
+def run_iteration() -> int:
+    """
+    One timed change-feed pass; sampled by the profiler when requested.
+    Returns the number of changed rows (0 when not the leader).
+    """
+    profiling = PROFILER_ENABLED and profile_requested.is_set()
+    profile_requested.clear()
+    if not leader.is_leader():
+        return 0
+    with loop_seconds.time(), (SamplingProfiler() if profiling else nullcontext()):
+        return with_db(poll_once, retries=3)
+
+
+async def run_push_loop(stop: asyncio.Event):
+    """
+    Waits for notifications on the LISTEN connection (a loop reader, no
+    thread blocks on it) and runs the change feed as soon as one arrives.
+    The feed itself is the watermark query, so a catch-up pass after every
+    (re)connect picks up whatever happened while nobody was listening.
+    Without notifications the feed still runs every PUSH_FALLBACK_INTERVAL
+    seconds as a safety net.
+    """
+    loop = asyncio.get_running_loop()
+    if PUSH_INSTALL_TRIGGERS:
+        try:
+            await run_blocking(with_db, install_notify_triggers, name="Push mode setup", timeout=POLL_TIMEOUT)
+        except Exception as e:
+            print("Push mode: could not install triggers:", e)
+
+    woken = asyncio.Event()
+    lost = asyncio.Event()
+
+    def on_readable(conn, fd):
+        try:
+            conn.poll()
+            if conn.notifies:
+                conn.notifies.clear()
+                woken.set()
+        except Exception as e:
+            print("Push mode: LISTEN connection lost:", e)
+            # wake the loop first: a closed connection has no fileno() any more
+            lost.set()
+            woken.set()
+            loop.remove_reader(fd)
+
+    listen_conn = None
+    listen_fd = None
+    while not stop.is_set():
+        try:
+            if listen_conn is None:
+                listen_conn = await run_blocking(open_listen_connection, name="LISTEN connect", timeout=POLL_TIMEOUT)
+                lost.clear()
+                listen_fd = listen_conn.fileno()
+                loop.add_reader(listen_fd, on_readable, listen_conn, listen_fd)
+                print("Push mode: listening for changes")
+                await run_blocking(run_iteration, name="Change feed", timeout=POLL_TIMEOUT)
+
+            # followers wake up often enough to notice a dead leader
+            timeout = PUSH_FALLBACK_INTERVAL if leader.holding else LEADER_RETRY_INTERVAL
+            try:
+                await asyncio.wait_for(woken.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            woken.clear()
+            if lost.is_set() or listen_conn.closed:
+                raise ConnectionError("LISTEN connection lost")
+            await run_blocking(run_iteration, name="Change feed", timeout=POLL_TIMEOUT)
+
+        except Exception as e:
+            # Never crash the process (avoid Railway restarts due to unhandled exceptions)
+            print("Push loop error:", e)
+            if listen_fd is not None:
+                loop.remove_reader(listen_fd)
+            if listen_conn is not None:
+                try:
+                    listen_conn.close()
+                except Exception:
+                    pass
+            listen_conn = listen_fd = None
+            await asyncio.sleep(CHECK_INTERVAL)
+
+    if listen_conn is not None:
+        loop.remove_reader(listen_fd)
+        listen_conn.close()
+
+
+async def run_poll_loop(stop: asyncio.Event):
+    """
+    Polls quickly while things change and backs off while they don't:
+    POLL_MIN_INTERVAL after a pass that saw rows, doubling per quiet pass
+    up to POLL_MAX_INTERVAL.
+    """
+    interval = POLL_MIN_INTERVAL
+    while not stop.is_set():
+        try:
+            seen = await run_blocking(run_iteration, name="Change feed", timeout=POLL_TIMEOUT)
+            if seen:
+                interval = POLL_MIN_INTERVAL
+            else:
+                interval = min(interval * 2, POLL_MAX_INTERVAL)
+
+        except Exception as e:
+            # Never crash the process (avoid Railway restarts due to unhandled exceptions)
+            print("Main loop error:", e)
+            interval = max(interval, CHECK_INTERVAL)
+
+        # followers wake up often enough to notice a dead leader
+        wait = interval if leader.holding else min(interval, LEADER_RETRY_INTERVAL)
+        try:
+            await asyncio.wait_for(stop.wait(), wait)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def schedule_daily_report():
+    while True:
+        now = datetime.now(ALMATY_TZ)
+        target = now.replace(hour=9, minute=0, second=0, microsecond=0)
+
+        if now > target:
+            target += timedelta(days=1)
+
+        sleep_sec = (target - now).total_seconds()
+        await asyncio.sleep(sleep_sec)
+
+        # with HA only the leader of shard 0 sends it
+        if leader.holding and SHARD_INDEX == 0:
+            try:
+                await run_blocking(daily_report_once, name="Daily report", timeout=REPORT_TIMEOUT)
+            except Exception as e:
+                print("Daily report error:", e)
+
+
+async def main_async():
+    loop = asyncio.get_running_loop()
+    bind_loop(loop)
+
+    # Railway stops the container with SIGTERM: finish the current pass,
+    # send what is queued and flush checkpoints instead of dying mid-write
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    outbound.start()
+    metrics_server = await start_metrics_server()
+
+    # the feed starts right away; nothing below waits for the DB or Telegram
+    feed = run_push_loop(stop) if NOTIFY_MODE == "push" else run_poll_loop(stop)
+    tasks = [
+        asyncio.create_task(feed),
+        asyncio.create_task(schedule_daily_report()),
+        asyncio.create_task(timers.run(lambda: leader.holding)),
+    ]
+    spawn_blocking(check_indexes, name="Index check", timeout=POLL_TIMEOUT)
+
+    await stop.wait()
+    print("Shutting down...")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    await outbound.drain(SHUTDOWN_DRAIN_TIMEOUT)
+    await outbound.stop()
+    if metrics_server is not None:
+        metrics_server.close()
+    # idle pooled sessions end cleanly instead of being dropped with the process
+    db_pool.close_all()
+    if replica_pool is not None:
+        replica_pool.close_all()
+    checkpoints.flush()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["replay"]:
+        from .replay import main as replay_main
+
+        return replay_main(argv[1:])
+
+    validate()
+    router.compile()
+    print(f"Booking notifier started ({NOTIFY_MODE} mode)...")
+
+    # flush buffered checkpoints on normal exit as well
+    atexit.register(checkpoints.flush)
+
+    asyncio.run(main_async())
@@ -0,0 +1,96 @@
+"""Local SQLite key/value store for state kept between restarts."""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config import CHECKPOINT_FLUSH_INTERVAL, CHECKPOINT_PATH
+
+
+# ===================================
+# Checkpoints (local state between restarts)
+# ===================================
+
+class CheckpointStore:
+    """
+    Small key/value store in SQLite (WAL mode), values are JSON.
+    set() only buffers; buffered values are written in one transaction by
+    flush(), which flush_if_due() calls at most every CHECKPOINT_FLUSH_INTERVAL
+    seconds, so a busy poll loop costs one commit per interval.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._dirty: Dict[str, Any] = {}
+        self._last_flush = time.monotonic()
+
+    def _db(self) -> sqlite3.Connection:
+        """Opens the file on first use (callers hold self._lock)."""
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            if key in self._dirty:
+                return self._dirty[key]
+            row = self._db().execute("SELECT value FROM checkpoints WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._dirty[key] = value
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            rows = [(k, json.dumps(v), now) for k, v in self._dirty.items()]
+            conn = self._db()
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(
+                    """
+                    INSERT INTO checkpoints (key, value, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+                    """,
+                    rows,
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._dirty.clear()
+            self._last_flush = time.monotonic()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._dirty.pop(key, None)
+            self._db().execute("DELETE FROM checkpoints WHERE key = ?", (key,))
+
+    def flush_if_due(self):
+        if time.monotonic() - self._last_flush >= CHECKPOINT_FLUSH_INTERVAL:
+            try:
+                self.flush()
+            except Exception as e:
+                print("Checkpoint flush error:", e)
+
+
+checkpoints = CheckpointStore(CHECKPOINT_PATH)
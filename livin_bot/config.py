@@ -0,0 +1,91 @@
+"""Settings read from the environment (and .env, loaded by the entry point)."""
+
+import os
+from typing import List
+
+import pytz
+
+
+# ===================================
+# ENV
+# ===================================
+
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+# optional hot standby for reports and lookups (same db/user/password)
+DB_REPLICA_HOST = os.getenv("DB_REPLICA_HOST")
+DB_REPLICA_PORT = os.getenv("DB_REPLICA_PORT", DB_PORT)
+
+# Токен бота, который отвечает за брони
+TOKEN = os.getenv("TELEGRAM_BOOKING_BOT_TOKEN") or os.getenv("TELEGRAM_BOT_TOKEN")
+
+CHAT_IDS_RAW = (
+    os.getenv("TELEGRAM_BOOKING_CHAT_IDS")
+    or os.getenv("TELEGRAM_CHAT_IDS")
+    or os.getenv("TELEGRAM_CHAT_ID")
+    or ""
+)
+
+CHAT_IDS: List[int] = []
+for part in CHAT_IDS_RAW.replace(" ", "").split(","):
+    if part:
+        try:
+            CHAT_IDS.append(int(part))
+        except ValueError:
+            pass
+
+CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", 10))
+
+# poll mode: the interval drops to POLL_MIN_INTERVAL after a change and
+# doubles on every quiet tick up to POLL_MAX_INTERVAL (seconds)
+POLL_MIN_INTERVAL = float(os.getenv("POLL_MIN_INTERVAL", 2))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", CHECK_INTERVAL))
+
+# change feed: rows per page and max pages per tick (per table)
+POLL_BATCH_SIZE = int(os.getenv("POLL_BATCH_SIZE", 200))
+POLL_MAX_PAGES = int(os.getenv("POLL_MAX_PAGES", 10))
+# each tick also re-reads this many seconds before the previous read, for
+# rows whose transaction committed after a newer one; 0 = strict keyset
+POLL_OVERLAP = float(os.getenv("POLL_OVERLAP", 5))
+
+# "poll" (adaptive interval) or "push" (LISTEN/NOTIFY triggers)
+NOTIFY_MODE = os.getenv("NOTIFY_MODE", "poll").strip().lower()
+# push mode: create the notify triggers on start (needs CREATE/TRIGGER rights)
+PUSH_INSTALL_TRIGGERS = os.getenv("PUSH_INSTALL_TRIGGERS", "1") == "1"
+# push mode: run the catch-up query at least this often (seconds)
+PUSH_FALLBACK_INTERVAL = int(os.getenv("PUSH_FALLBACK_INTERVAL", 300))
+
+# local checkpoint store (mount a volume here to survive redeploys)
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "checkpoints.sqlite3")
+# buffered checkpoint writes are committed at most this often (seconds)
+CHECKPOINT_FLUSH_INTERVAL = float(os.getenv("CHECKPOINT_FLUSH_INTERVAL", 5))
+# on start, replay at most this much downtime (seconds)
+CATCHUP_MAX_AGE = int(os.getenv("CATCHUP_MAX_AGE", 6 * 3600))
+# on start, the catch-up pass may read up to this many pages per table
+CATCHUP_MAX_PAGES = int(os.getenv("CATCHUP_MAX_PAGES", 50))
+
+# group events arriving within this many seconds into one digest; 0 = off
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", 0))
+# digest: max events listed per kind, the rest become "+K ещё"
+COALESCE_MAX_ITEMS = int(os.getenv("COALESCE_MAX_ITEMS", 10))
+
+# run several replicas: only the holder of the advisory lock polls and sends
+HA_ENABLED = os.getenv("HA_ENABLED", "0") == "1"
+LEADER_LOCK_KEY = int(os.getenv("LEADER_LOCK_KEY", 7420131))
+# followers try to take the lock this often (seconds)
+LEADER_RETRY_INTERVAL = int(os.getenv("LEADER_RETRY_INTERVAL", 5))
+# optional horizontal split: shard i handles ids with hash(id) % SHARD_COUNT == i,
+# each shard has its own leader; shard 0 also owns the daily report
+SHARD_COUNT = max(int(os.getenv("SHARD_COUNT", 1)), 1)
+SHARD_INDEX = int(os.getenv("SHARD_INDEX", 0))
+
+ALMATY_TZ = pytz.timezone("Asia/Almaty")
+
+
+def validate():
+    """Fails fast on settings the bot cannot run without (called by the entry point)."""
+    if not CHAT_IDS:
+        raise RuntimeError("Не указаны TELEGRAM_BOOKING_CHAT_IDS/TELEGRAM_CHAT_IDS/TELEGRAM_CHAT_ID в .env")
@@ -0,0 +1,249 @@
+"""Typed data access for the hot feed queries: prepared statements and lean row records."""
+
+import os
+import re
+import weakref
+from typing import List
+
+import psycopg2.errors
+
+from .metrics import Counter, timed_execute
+
+
+# ===================================
+# Row records
+# ===================================
+
+class Record:
+    """Base for the row records: named fields in __slots__, no per-row dict."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class RequestRow(Record):
+    """A contract_requests row in REQUESTS_SQL column order."""
+
+    __slots__ = (
+        "id", "status", "cost", "arrival", "departure", "title", "city", "tenant_id",
+        "tenant_name", "tenant_phone", "landlord_name", "landlord_phone",
+        "apartment_ad_id", "created_at", "updated_at",
+    )
+
+    def __init__(self, id, status, cost, arrival, departure, title, city, tenant_id,
+                 tenant_name, tenant_phone, landlord_name, landlord_phone,
+                 apartment_ad_id, created_at, updated_at):
+        self.id = id
+        self.status = status
+        self.cost = cost
+        self.arrival = arrival
+        self.departure = departure
+        self.title = title
+        self.city = city
+        self.tenant_id = tenant_id
+        self.tenant_name = tenant_name
+        self.tenant_phone = tenant_phone
+        self.landlord_name = landlord_name
+        self.landlord_phone = landlord_phone
+        self.apartment_ad_id = apartment_ad_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+
+class ContractRow(Record):
+    """A contracts row in CONTRACTS_SQL column order."""
+
+    __slots__ = (
+        "id", "status", "cost", "arrival", "departure", "title", "city", "tenant_id", "landlord_id",
+        "tenant_name", "tenant_phone", "landlord_name", "landlord_phone",
+        "apartment_ad_id", "created_at", "updated_at",
+        "is_payment_success", "payed_at", "retry_payment_attempts",
+    )
+
+    def __init__(self, id, status, cost, arrival, departure, title, city, tenant_id, landlord_id,
+                 tenant_name, tenant_phone, landlord_name, landlord_phone,
+                 apartment_ad_id, created_at, updated_at,
+                 is_payment_success, payed_at, retry_payment_attempts):
+        self.id = id
+        self.status = status
+        self.cost = cost
+        self.arrival = arrival
+        self.departure = departure
+        self.title = title
+        self.city = city
+        self.tenant_id = tenant_id
+        self.landlord_id = landlord_id
+        self.tenant_name = tenant_name
+        self.tenant_phone = tenant_phone
+        self.landlord_name = landlord_name
+        self.landlord_phone = landlord_phone
+        self.apartment_ad_id = apartment_ad_id
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.is_payment_success = is_payment_success
+        self.payed_at = payed_at
+        self.retry_payment_attempts = retry_payment_attempts
+
+
+# ===================================
+# Prepared statements
+# ===================================
+
+# 0 sends the statements as plain text, e.g. behind a transaction-pooling
+# PgBouncer where a prepared statement does not outlive the transaction
+DB_PREPARE = os.getenv("DB_PREPARE", "1") != "0"
+
+_PARAM_RE = re.compile(r"%\((\w+)\)s")
+
+# connection -> names prepared on it; an entry goes away with its connection
+_prepared: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+statements_prepared_total = Counter(
+    "livin_db_statements_prepared_total", "PREPAREs sent (once per statement and connection)", ["statement"]
+)
+
+
+class Statement:
+    """
+    A hot query PREPAREd once per pooled connection and then run with
+    EXECUTE: the server parses and analyzes it once and can switch to a
+    cached generic plan instead of planning it again every tick.
+
+    `sql` keeps the usual %(name)s placeholders; they become $1..$n in
+    order of first use. fetch() decodes rows into `row_type`.
+    """
+
+    def __init__(self, label: str, sql: str, row_type=None):
+        self.label = label
+        self.name = f"livin_{label}"
+        self.sql = sql
+        self.row_type = row_type
+        self.params = list(dict.fromkeys(_PARAM_RE.findall(sql)))
+        body = _PARAM_RE.sub(lambda m: f"${self.params.index(m.group(1)) + 1}", sql)
+        # run without parameters, so a literal %% must be a single % here
+        self.prepare_sql = f"PREPARE {self.name} AS {body.replace('%%', '%').strip().rstrip(';')}"
+        placeholders = ", ".join(["%s"] * len(self.params))
+        self.execute_sql = f"EXECUTE {self.name} ({placeholders})" if self.params else f"EXECUTE {self.name}"
+
+    def _prepare(self, cur, names: set):
+        try:
+            cur.execute(self.prepare_sql)
+        except psycopg2.errors.DuplicatePreparedStatement:
+            pass  # prepared by an earlier life of this session
+        names.add(self.name)
+        statements_prepared_total.inc(self.label)
+
+    def execute(self, cur, params: dict):
+        if not DB_PREPARE:
+            timed_execute(cur, self.label, self.sql, params)
+            return
+        names = _prepared.setdefault(cur.connection, set())
+        if self.name not in names:
+            self._prepare(cur, names)
+        args = [params[p] for p in self.params]
+        try:
+            timed_execute(cur, self.label, self.execute_sql, args)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # dropped server-side (DISCARD ALL / DEALLOCATE): prepare again once
+            names.discard(self.name)
+            self._prepare(cur, names)
+            timed_execute(cur, self.label, self.execute_sql, args)
+
+    def fetch(self, cur, params: dict) -> List:
+        self.execute(cur, params)
+        rows = cur.fetchall()
+        if self.row_type is None:
+            return rows
+        row_type = self.row_type
+        return [row_type(*row) for row in rows]
+
+
+# ===================================
+# JSONB projections
+# ===================================
+
+# The JSONB documents are large, but the bot only prints a few fields
+# from them: those are extracted server-side (->>, #>>), so the rows
+# carry short text columns and nothing has to be json-decoded. A missing
+# key or a JSON null comes back as NULL.
+
+def ad_columns(column: str) -> str:
+    """title, city of a "baseApartmentAdData"."""
+    return f"""{column} ->> 'title',
+        {column} #>> '{{address,city}}'"""
+
+
+def person_columns(column: str) -> str:
+    """name, phone of a "tenantInformation" / "landlordInformation" (see extract_person)."""
+    return f"""NULLIF(btrim(concat_ws(' ', {column} ->> 'firstName', {column} ->> 'lastName')), ''),
+        COALESCE(NULLIF({column} ->> 'phoneNumber', ''), NULLIF({column} ->> 'phone', ''))"""
+
+
+# ===================================
+# Feed queries
+# ===================================
+
+def shard_filter(id_column: str) -> str:
+    """This instance's share of the rows; true for every row when %(shards)s = 1."""
+    return f"(%(shards)s = 1 OR (hashtext({id_column}::text) & 2147483647) %% %(shards)s = %(shard)s)"
+
+
+# the projection and FROM of the feed queries; replay and the timers add
+# their own WHERE
+REQUESTS_SELECT = f"""
+    SELECT
+        r.id,
+        r.status,
+        r.cost,
+        r."arrivalDate",
+        r."departureDate",
+        {ad_columns('r."baseApartmentAdData"')},
+        r."tenantId",
+        {person_columns('r."tenantInformation"')},
+        {person_columns('r."landlordInformation"')},
+        r."apartmentAdId",
+        r."createdAt",
+        r."updatedAt"
+    FROM contract_requests r
+"""
+
+REQUESTS_SQL = REQUESTS_SELECT + f"""    WHERE r."updatedAt" >= %(ts)s
+      AND (r."updatedAt" > %(ts)s OR r.id > %(id)s)
+      AND {shard_filter('r.id')}
+    ORDER BY r."updatedAt", r.id
+    LIMIT %(limit)s;
+"""
+
+CONTRACTS_SELECT = f"""
+    SELECT
+        c.id,
+        c.status,
+        c.cost,
+        c."arrivalDate",
+        c."departureDate",
+        {ad_columns('c."baseApartmentAdData"')},
+        c."tenantId",
+        c."landlordId",
+        {person_columns('c."tenantInformation"')},
+        {person_columns('c."landlordInformation"')},
+        c."apartmentAdId",
+        c."createdAt",
+        c."updatedAt",
+        c."isPaymentSuccess",
+        c."payedAt",
+        c."retryPaymentAttempts"
+    FROM contracts c
+"""
+
+CONTRACTS_SQL = CONTRACTS_SELECT + f"""    WHERE c."updatedAt" >= %(ts)s
+      AND (c."updatedAt" > %(ts)s OR c.id > %(id)s)
+      AND {shard_filter('c.id')}
+    ORDER BY c."updatedAt", c.id
+    LIMIT %(limit)s;
+"""
+
+feed_requests = Statement("feed_contract_requests", REQUESTS_SQL, RequestRow)
+feed_contracts = Statement("feed_contracts", CONTRACTS_SQL, ContractRow)
@@ -0,0 +1,415 @@
+"""PostgreSQL connection pool, retries and the index check."""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+try:
+    # optional: several times faster than the json module on big documents
+    import orjson
+except ImportError:
+    orjson = None
+
+from .config import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_REPLICA_HOST, DB_REPLICA_PORT, DB_USER
+from .metrics import CallbackMetric, Counter, db_connect_seconds, db_errors_total, db_query_seconds, timed_execute
+from .runtime import _active_conns
+
+
+# ===================================
+# DB Connection pool (reconnect + retry)
+# ===================================
+
+def make_dsn(host, port) -> str:
+    return (
+        f"host={host} "
+        f"port={port} "
+        f"dbname={DB_NAME} "
+        f"user={DB_USER} "
+        f"password={DB_PASSWORD} "
+        # keepalive helps with idle SSL drops; connect_timeout avoids hanging
+        f"connect_timeout=10 "
+        f"keepalives=1 keepalives_idle=30 keepalives_interval=10 keepalives_count=5"
+    )
+
+
+DB_CONN = make_dsn(DB_HOST, DB_PORT)
+DB_REPLICA_CONN = make_dsn(DB_REPLICA_HOST, DB_REPLICA_PORT) if DB_REPLICA_HOST else None
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 4))
+# recycle connections older than this (seconds), even if healthy
+DB_CONN_MAX_AGE = int(os.getenv("DB_CONN_MAX_AGE", 1800))
+# a connection idle longer than this (seconds) is pinged with SELECT 1 before reuse
+DB_CONN_VALIDATE_AFTER = int(os.getenv("DB_CONN_VALIDATE_AFTER", 30))
+
+# json/jsonb columns that are still selected whole are decoded with this
+json_loads = orjson.loads if orjson is not None else json.loads
+
+# how long with_db waits for a free connection (seconds)
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_REPLICA_POOL_SIZE = int(os.getenv("DB_REPLICA_POOL_SIZE", 2))
+# the replica is used only while it is at most this far behind (seconds)
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", 10))
+# how often the replica's lag is re-checked (seconds)
+DB_REPLICA_CHECK_INTERVAL = int(os.getenv("DB_REPLICA_CHECK_INTERVAL", 30))
+
+# workload class -> (may use the replica, statement_timeout in seconds)
+WORKLOADS = {
+    # change feed, timers, catch-up and everything they run on their cursor:
+    # the user / apartment lookups of a page (a just-created user must
+    # resolve) and the hourly aggregate reconcile (serialized with the feed;
+    # a lagging read would roll back what the feed already applied)
+    "poll": (False, float(os.getenv("DB_STATEMENT_TIMEOUT_POLL", 30))),
+    # the 09:00 report's reconcile of yesterday/today, replay: long date-range scans
+    "report": (True, float(os.getenv("DB_STATEMENT_TIMEOUT_REPORT", 300))),
+    # standalone catalog queries outside the feed (the index check)
+    "lookup": (True, float(os.getenv("DB_STATEMENT_TIMEOUT_LOOKUP", 10))),
+}
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of autocommit connections, reused between calls.
+
+    Before reuse a connection is checked cheaply (closed flag, transaction
+    status, age); one that sat idle for a while is also pinged with SELECT 1.
+    Connections are recycled after DB_CONN_MAX_AGE and dropped immediately
+    when they fail with a connection-level error (e.g. SSL drop).
+    """
+
+    def __init__(self, dsn: str, max_size: int, max_age: float, validate_after: float):
+        self.dsn = dsn
+        self.max_age = max_age
+        self.validate_after = validate_after
+        self._idle: List[list] = []  # [conn, created_at, last_used, statement_timeout ms]
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self):
+        with db_connect_seconds.time():
+            conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        # known OIDs, no round trip
+        psycopg2.extras.register_default_json(conn, loads=json_loads)
+        psycopg2.extras.register_default_jsonb(conn, loads=json_loads)
+        return [conn, time.monotonic(), time.monotonic(), None]
+
+    def _usable(self, entry) -> bool:
+        conn, created_at, last_used, _ = entry
+        now = time.monotonic()
+        if conn.closed or now - created_at > self.max_age:
+            return False
+        if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if now - last_used > self.validate_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+            except Exception:
+                return False
+        return True
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Returns a pool entry [conn, created_at, last_used, timeout]; give it back with release()."""
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise psycopg2.OperationalError("DB pool exhausted")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+                if entry is None:
+                    return self._connect()
+                if self._usable(entry):
+                    return entry
+                self._close(entry[0])
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, entry, broken: bool = False):
+        try:
+            if broken or entry[0].closed:
+                self._close(entry[0])
+            else:
+                entry[2] = time.monotonic()
+                with self._lock:
+                    self._idle.append(entry)
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, *_ in idle:
+            self._close(conn)
+
+
+db_pool = ConnectionPool(DB_CONN, DB_POOL_SIZE, DB_CONN_MAX_AGE, DB_CONN_VALIDATE_AFTER)
+
+
+# ===================================
+# Read replica (lag-checked, falls back to the primary)
+# ===================================
+
+# on a standby: 0 when everything received is replayed, else the age of the
+# last replayed transaction; NULL on a primary
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END;
+"""
+
+db_route_total = Counter("livin_db_route_total", "with_db calls by workload and server", ["workload", "target"])
+
+
+class ReplicaMonitor:
+    """
+    Decides whether replica-eligible work may use the replica: at most every
+    DB_REPLICA_CHECK_INTERVAL one caller measures its lag, everyone else
+    reuses the answer. An unreachable, lagging or not-in-recovery server
+    routes the work to the primary until the next check.
+    """
+
+    def __init__(self, pool: Optional[ConnectionPool], max_lag: float, interval: float):
+        self.pool = pool
+        self.max_lag = max_lag
+        self.interval = interval
+        self.lag: Optional[float] = None
+        self.healthy: Optional[bool] = None
+        self._checked = float("-inf")
+        self._lock = threading.Lock()
+
+    def _check(self):
+        entry = None
+        broken = False
+        try:
+            entry = self.pool.acquire()
+            with entry[0].cursor() as cur:
+                with db_query_seconds.time("replica_lag"):
+                    cur.execute(REPLICA_LAG_SQL)
+                lag = cur.fetchone()[0]
+            self.lag = None if lag is None else float(lag)
+            healthy = self.lag is not None and self.lag <= self.max_lag
+            reason = "not a standby" if self.lag is None else f"lag {self.lag:.1f}s"
+        except Exception as e:
+            broken = entry is not None
+            healthy, reason = False, f"unreachable: {e}"
+        finally:
+            if entry is not None:
+                self.pool.release(entry, broken=broken)
+        if healthy != self.healthy:
+            print(f"DB replica {'in use' if healthy else 'skipped, using the primary'} ({reason})")
+        self.healthy = healthy
+
+    def usable(self) -> bool:
+        if self.pool is None:
+            return False
+        if time.monotonic() - self._checked >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self._check()
+                self._checked = time.monotonic()
+            finally:
+                self._lock.release()
+        return bool(self.healthy)
+
+    def mark_down(self):
+        """A query on the replica hit a connection error: primary until the next check."""
+        if self.healthy:
+            print("DB replica connection failed, using the primary")
+        self.healthy = False
+        self._checked = time.monotonic()
+
+
+replica_pool = (
+    ConnectionPool(DB_REPLICA_CONN, DB_REPLICA_POOL_SIZE, DB_CONN_MAX_AGE, DB_CONN_VALIDATE_AFTER)
+    if DB_REPLICA_CONN else None
+)
+replica = ReplicaMonitor(replica_pool, DB_REPLICA_MAX_LAG, DB_REPLICA_CHECK_INTERVAL)
+
+CallbackMetric(
+    "livin_db_replica_lag_seconds", "Replica lag at the last check (-1 when unknown)", "gauge",
+    lambda: {(): -1 if replica.lag is None else replica.lag},
+)
+
+
+def _set_statement_timeout(entry, seconds: float):
+    """Sets the session's statement_timeout, skipping the round trip if it already matches."""
+    ms = int(seconds * 1000)
+    if entry[3] != ms:
+        with entry[0].cursor() as cur:
+            cur.execute("SET statement_timeout = %s", (ms,))
+        entry[3] = ms
+
+
+def with_db(fn: Callable[[Any], Any], *, retries: int = 5, workload: str = "poll"):
+    """
+    Runs fn(cur) on a pooled DB connection.
+    `workload` (see WORKLOADS) picks the statement_timeout and whether the
+    lag-checked replica may serve it; the primary is the fallback.
+    Retries with exponential backoff; connections that failed with
+    OperationalError/InterfaceError are discarded, not returned to the pool.
+    A cancelled statement (run_blocking's timeout or statement_timeout) is
+    not retried.
+    """
+    use_replica, statement_timeout = WORKLOADS[workload]
+    backoff = 1
+    last_err: Optional[Exception] = None
+
+    for attempt in range(retries):
+        pool = replica_pool if use_replica and replica.usable() else db_pool
+        entry = None
+        broken = False
+        try:
+            entry = pool.acquire()
+            _active_conns[threading.get_ident()] = entry[0]
+            _set_statement_timeout(entry, statement_timeout)
+            db_route_total.inc(workload, "replica" if pool is replica_pool else "primary")
+            with entry[0].cursor() as cur:
+                return fn(cur)
+        except psycopg2.extensions.QueryCanceledError:
+            db_errors_total.inc("cancelled")
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+            last_err = e
+            broken = True
+            db_errors_total.inc("connection")
+            print(f"DB OperationalError (attempt {attempt+1}/{retries}): {e}")
+            if pool is replica_pool:
+                replica.mark_down()
+                continue  # straight to the primary, no backoff
+        except Exception as e:
+            # other DB errors: don't crash, retry a bit
+            last_err = e
+            db_errors_total.inc("other")
+            print(f"DB error (attempt {attempt+1}/{retries}): {e}")
+        finally:
+            _active_conns.pop(threading.get_ident(), None)
+            if entry is not None:
+                pool.release(entry, broken=broken)
+
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 15)
+
+    raise last_err if last_err else RuntimeError("DB error: unknown")
+
+
+# ===================================
+# DB indexes used by the bot's queries
+# ===================================
+
+# (table, leading columns, index name, DDL). The bot never creates them
+# itself: CREATE INDEX on the app's tables is left to whoever owns the schema.
+REQUIRED_INDEXES = [
+    (
+        "contracts",
+        '"payedAt"',
+        "contracts_paid_payed_at_idx",
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS contracts_paid_payed_at_idx '
+        'ON contracts ("payedAt") '
+        "WHERE status = 'CONCLUDED' AND \"isPaymentSuccess\" = true;",
+    ),
+    (
+        "contracts",
+        '"arrivalDate"',
+        "contracts_paid_arrival_date_idx",
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS contracts_paid_arrival_date_idx '
+        'ON contracts ("arrivalDate") '
+        "WHERE status = 'CONCLUDED' AND \"isPaymentSuccess\" = true;",
+    ),
+    (
+        "contracts",
+        '"departureDate"',
+        "contracts_timers_departure_date_idx",
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS contracts_timers_departure_date_idx '
+        'ON contracts ("departureDate") '
+        "WHERE \"isPaymentSuccess\" = true AND status IN ('CONCLUDED', 'COMPLETED');",
+    ),
+    (
+        # the look-ahead query also wants COMPLETED contracts by arrival date,
+        # which contracts_paid_arrival_date_idx does not cover
+        "contracts",
+        '"arrivalDate"',
+        "contracts_timers_arrival_date_idx",
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS contracts_timers_arrival_date_idx '
+        'ON contracts ("arrivalDate") '
+        "WHERE \"isPaymentSuccess\" = true AND status IN ('CONCLUDED', 'COMPLETED');",
+    ),
+    (
+        "contracts",
+        '"updatedAt", id',
+        "contracts_updated_at_id_idx",
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS contracts_updated_at_id_idx '
+        'ON contracts ("updatedAt", id);',
+    ),
+    (
+        "contract_requests",
+        '"updatedAt", id',
+        "contract_requests_updated_at_id_idx",
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS contract_requests_updated_at_id_idx '
+        'ON contract_requests ("updatedAt", id);',
+    ),
+]
+
+
+def check_indexes():
+    """
+    Warns (does not fail) about missing indexes. An index counts as present
+    if it exists under its name, or if a non-partial index on the table
+    starts with the required columns: that one serves any predicate, while a
+    partial index with another WHERE may not cover the query at all.
+    """
+    def _run(cur):
+        with db_query_seconds.time("index_check"):
+            cur.execute(
+                """
+                SELECT tablename, indexname, indexdef
+                FROM pg_indexes
+                WHERE tablename = ANY(%s);
+                """,
+                (list({t for t, _, _, _ in REQUIRED_INDEXES}),),
+            )
+        return cur.fetchall()
+
+    try:
+        existing = with_db(_run, retries=2, workload="lookup")
+    except Exception as e:
+        print("Index check skipped:", e)
+        return
+
+    for table, columns, name, ddl in REQUIRED_INDEXES:
+        if not any(
+            t == table and (n == name or (f"({columns}" in d and " WHERE " not in d))
+            for t, n, d in existing
+        ):
+            print(f"WARNING: index {name} is missing, queries on {table} will scan. Create it with:\n  {ddl}")
+
+
+# rows fetched per round trip by the report's server-side cursors
+REPORT_ITERSIZE = int(os.getenv("REPORT_ITERSIZE", 500))
+
+
+def stream_rows(cur, sql: str, params, name: str):
+    """
+    Yields rows through a server-side cursor, REPORT_ITERSIZE per round trip.
+    WITH HOLD (the pool is autocommit) makes the server build the whole
+    result before the first row, so this is for bounded report queries;
+    long ranges are read in keyset pages instead (see replay).
+    """
+    with cur.connection.cursor(name=name, withhold=True) as scur:
+        scur.itersize = REPORT_ITERSIZE
+        timed_execute(scur, name, sql, params)
+        yield from scur
@@ -0,0 +1,731 @@
+"""Change feed over contract_requests and contracts."""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+
+from .aggregates import daily_aggregates
+from .checkpoints import checkpoints
+from .config import (
+    CATCHUP_MAX_AGE,
+    CATCHUP_MAX_PAGES,
+    HA_ENABLED,
+    POLL_BATCH_SIZE,
+    POLL_MAX_PAGES,
+    POLL_OVERLAP,
+    SHARD_COUNT,
+    SHARD_INDEX,
+)
+from .dal import CONTRACTS_SELECT, ContractRow, RequestRow, Statement, feed_contracts, feed_requests, shard_filter
+from .helpers import (
+    extract_person,
+    fmt_date,
+    format_price,
+    now_utc,
+    payout_amount,
+    person_incomplete,
+    to_almaty,
+)
+from .lookups import get_apartment_link, pg_array, resolve_apartment_links, resolve_users
+from .metrics import db_query_seconds, events_total, feed_probes_total, timed_execute
+from .notifications import notify
+from .scheduler import TimerScheduler
+from .state import COMPLETED_READY, PAID, PAYED_AT, RowState, states
+from .telegram import PRIORITY_HIGH
+
+
+# ===================================
+# Change feed (watermark + keyset pagination)
+# ===================================
+
+# Start position for a table that is still empty: every row is newer than this.
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# handlers run on the feed and on the timers; both update the state index
+handler_lock = threading.Lock()
+
+# table -> (updatedAt, id) of the last processed row; None until initialised
+watermarks = {"contract_requests": None, "contracts": None}
+# table -> server time (now()) of the previous probe; None until the first one
+read_at = {"contract_requests": None, "contracts": None}
+
+REQUEST_EVENTS = {
+    "CREATED": "request_created",
+    "ACCEPTED": "request_accepted",
+    "REJECTED": "request_rejected",
+}
+
+
+def request_event(old: Optional[RowState], new: RowState) -> Optional[str]:
+    """Notification for a request moving from `old` (None = unseen) to `new`."""
+    if old is not None and old.status == new.status:
+        return None
+    return REQUEST_EVENTS.get(new.status)
+
+
+def contract_kind(state: RowState) -> Optional[str]:
+    """The notification a contract in this state stands for (OFFERING: none)."""
+    status = state.status
+    if status == "CREATED":
+        return "contract_created"
+    if status == "CONCLUDED":
+        if state.flags & PAID:
+            # paid is announced once "payedAt" is set as well
+            return "paid" if state.flags & PAYED_AT else None
+        return "retry_failed" if state.retries >= 1 else "payment_failed"
+    if status == "COMPLETED":
+        return "completed" if state.flags & COMPLETED_READY else None
+    if status == "REJECTED":
+        return "contract_rejected"
+    if status == "FREEZE":
+        return "frozen"
+    return None
+
+
+def contract_event(old: Optional[RowState], new: RowState) -> Optional[str]:
+    """
+    Notification for a contract moving from `old` (None = unseen) to `new`:
+    fired when the state now stands for a different notification, and
+    again for every further failed payment retry.
+    """
+    kind = contract_kind(new)
+    if kind is None or old is None:
+        return kind
+    if kind != contract_kind(old):
+        return kind
+    if kind == "retry_failed" and new.retries > old.retries:
+        return kind
+    return None
+
+
+def fetch_head(cur, table):
+    """
+    Current (updatedAt, id) head of the table.
+    Used to start the feed "from now" like the old latest-row polling did.
+    """
+    with db_query_seconds.time("feed_head"):
+        cur.execute(
+            f"""
+            SELECT "updatedAt", id
+            FROM {table}
+            ORDER BY "updatedAt" DESC, id DESC
+            LIMIT 1;
+            """
+        )
+    row = cur.fetchone()
+    if not row:
+        return (EPOCH, None)
+    return (row[0], row[1])
+
+
+def request_state(req: RequestRow) -> RowState:
+    return RowState(req.status)
+
+
+def handle_request(cur, req: RequestRow):
+    index = states["contract_requests"]
+    old = index.get(req.id)
+    new = request_state(req)
+    if old == new:
+        return
+    index.put(req.id, new)
+    events_total.inc("contract_requests", req.status)
+
+    event = request_event(old, new)
+    if event is not None:
+        announce_request(cur, req, event)
+
+
+def announce_request(cur, req: RequestRow, event: str, notify=notify):
+    """Renders the notification for `event`; `notify` is swapped out by the replay CLI."""
+    ad_title = req.title or "Квартира"
+    city = req.city or ""
+
+    tenant = extract_person(req.tenant_name, req.tenant_phone, cur=cur, fallback_user_id=req.tenant_id)
+    landlord = extract_person(req.landlord_name, req.landlord_phone)
+
+    price = format_price(req.cost)
+    link = get_apartment_link(cur, req.apartment_ad_id)
+    link_line = f'\n🔗 <a href="{link}">Открыть объявление</a>' if link else ""
+    summary = f"<b>{ad_title}</b> — {city} | 👤 {tenant['name']} | {price:,} ₸"
+
+    if event == "request_created":
+        notify("request_created", summary, f"""
+✉️ <b>Заявка отправлена</b>
+🕒 Создано: <b>{to_almaty(req.created_at)}</b>
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+🏠 Квартира: <b>{ad_title}</b>
+🌆 {city}
+
+📅 {fmt_date(req.arrival)} → {fmt_date(req.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+    elif event == "request_accepted":
+        notify("request_accepted", summary, f"""
+✅ <b>Заявка принята собственником</b>
+🕒 Создано: <b>{to_almaty(req.created_at)}</b>
+🕒 Обновлено: <b>{to_almaty(req.updated_at)}</b>
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+🏠 Квартира: <b>{ad_title}</b>
+🌆 {city}
+
+📅 {fmt_date(req.arrival)} → {fmt_date(req.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+    elif event == "request_rejected":
+        notify("request_rejected", summary, f"""
+❌ <b>Заявка отклонена</b>
+🕒 Создано: <b>{to_almaty(req.created_at)}</b>
+🕒 Обновлено: <b>{to_almaty(req.updated_at)}</b>
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+🏠 Квартира: <b>{ad_title}</b>
+🌆 {city}
+
+📅 {fmt_date(req.arrival)} → {fmt_date(req.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+
+def contract_state(contract: ContractRow) -> RowState:
+    flags = (PAID if contract.is_payment_success else 0) | (PAYED_AT if contract.payed_at else 0)
+    departure = contract.departure
+    if contract.status == "COMPLETED" and departure is not None and now_utc() >= departure:
+        flags |= COMPLETED_READY
+    return RowState(contract.status, flags, int(contract.retry_payment_attempts or 0))
+
+
+def handle_contract(cur, contract: ContractRow):
+    c = contract
+    daily_aggregates.observe(
+        cur, c.id, c.status, c.cost, c.arrival, c.departure, c.title, c.city,
+        (c.tenant_name, c.tenant_phone), (c.landlord_name, c.landlord_phone),
+        c.apartment_ad_id, c.is_payment_success, c.payed_at,
+    )
+    timers.observe(c.id, c.status, c.is_payment_success, c.arrival, c.departure)
+
+    index = states["contracts"]
+    old = index.get(c.id)
+    new = contract_state(contract)
+    if old == new:
+        return
+    index.put(c.id, new)
+    events_total.inc("contracts", c.status)
+
+    event = contract_event(old, new)
+    if event is not None:
+        announce_contract(cur, contract, event)
+
+
+def announce_contract(cur, contract: ContractRow, event: str, notify=notify):
+    """Renders the notification for `event`; `notify` is swapped out by the replay CLI."""
+    c = contract
+    tenant = extract_person(c.tenant_name, c.tenant_phone, cur=cur, fallback_user_id=c.tenant_id)
+    landlord = extract_person(c.landlord_name, c.landlord_phone, cur=cur, fallback_user_id=c.landlord_id)
+
+    title = c.title or "Квартира"
+    city = c.city or ""
+    price = format_price(c.cost)
+    link = get_apartment_link(cur, c.apartment_ad_id)
+    link_line = f'\n🔗 <a href="{link}">Открыть объявление</a>' if link else ""
+    summary = f"<b>{title}</b> — {city} | 👤 {tenant['name']} | {price:,} ₸"
+
+    if event == "contract_created":
+        notify("contract_created", summary, f"""
+📄 <b>Контракт создан</b>
+🕒 {to_almaty(c.created_at)}
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+🏠 {title}
+🌆 {city}
+
+📅 {fmt_date(c.arrival)} → {fmt_date(c.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+    elif event == "paid":
+        notify("paid", summary, f"""
+💳 <b>Бронь оплачена</b>
+🕒 Создано: <b>{to_almaty(c.created_at)}</b>
+🕒 Оплачено: <b>{to_almaty(c.payed_at)}</b>
+
+🏠 {title}
+🌆 {city}
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+📅 {fmt_date(c.arrival)} → {fmt_date(c.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+    elif event == "payment_failed":
+        notify("payment_failed", summary, f"""
+💥 <b>Оплата не прошла</b>
+Первая попытка списания после принятия заявки закончилась неуспешно.
+
+🏠 {title}
+🌆 {city}
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+📅 {fmt_date(c.arrival)} → {fmt_date(c.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", priority=PRIORITY_HIGH, city=city)
+
+    elif event == "retry_failed":
+        notify("retry_failed", summary, f"""
+💥 <b>Повторная оплата не прошла</b>
+Попыток оплаты: <b>{c.retry_payment_attempts or 0}</b>
+
+🏠 {title}
+🌆 {city}
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+📅 {fmt_date(c.arrival)} → {fmt_date(c.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", priority=PRIORITY_HIGH, city=city)
+
+    elif event == "completed":
+        notify("completed", summary, f"""
+🏁 <b>Проживание завершено</b>
+🕒 {to_almaty(c.updated_at)}
+
+🏠 {title}
+🌆 {city}
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+📅 {fmt_date(c.arrival)} → {fmt_date(c.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+    elif event == "contract_rejected":
+        notify("contract_rejected", summary, f"""
+❌ <b>Контракт отменён</b>
+🕒 {to_almaty(c.updated_at)}
+
+🏠 {title}
+🌆 {city}
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+📅 {fmt_date(c.arrival)} → {fmt_date(c.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+    elif event == "frozen":
+        notify("frozen", summary, f"""
+🧊 <b>Контракт заморожен</b>
+🕒 {to_almaty(c.updated_at)}
+
+ID: {c.id}
+
+🏠 {title}
+🌆 {city}
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+📅 {fmt_date(c.arrival)} → {fmt_date(c.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+
+def prefetch_requests(cur, rows):
+    resolve_apartment_links(cur, [row.apartment_ad_id for row in rows])
+    resolve_users(cur, [row.tenant_id for row in rows if person_incomplete(row.tenant_name, row.tenant_phone)])
+
+
+def prefetch_contracts(cur, rows):
+    resolve_apartment_links(cur, [row.apartment_ad_id for row in rows])
+    user_ids = [row.tenant_id for row in rows if person_incomplete(row.tenant_name, row.tenant_phone)]
+    user_ids += [row.landlord_id for row in rows if person_incomplete(row.landlord_name, row.landlord_phone)]
+    resolve_users(cur, user_ids)
+
+
+# (table, page statement, handler, page prefetch)
+FEEDS = [
+    ("contract_requests", feed_requests, handle_request, prefetch_requests),
+    ("contracts", feed_contracts, handle_contract, prefetch_contracts),
+]
+
+# One narrow round trip per tick: does any table have a row past its
+# watermark? Each EXISTS is an index-only probe on ("updatedAt", id), so
+# a quiet database costs a couple of index page reads instead of the
+# wide feed queries with their joins and JSONB columns. The shard filter
+# matches the feed's, so another shard's rows do not wake this one. now()
+# is the server's read time the overlap is measured from (see read_from).
+CHANGE_PROBE_SQL = "SELECT now(),\n       " + ",\n       ".join(
+    f'EXISTS (SELECT 1 FROM {table} WHERE "updatedAt" >= %({table}_ts)s '
+    f'AND ("updatedAt" > %({table}_ts)s OR id > %({table}_id)s) AND {shard_filter("id")})'
+    for table, *_ in FEEDS
+) + ";"
+change_probe = Statement("change_probe", CHANGE_PROBE_SQL)
+
+
+def read_from(table):
+    """
+    Where the next read of `table` starts: its watermark, or POLL_OVERLAP
+    seconds before the previous read if that is earlier. An "updatedAt" is
+    set before its transaction commits, so a row can become visible after
+    a newer one moved the watermark past it; the overlap picks it up and
+    the state index drops the rows seen already. The read time is the
+    server's, so the bot's clock skew does not shrink the overlap.
+    """
+    ts, last_id = watermarks[table]
+    if POLL_OVERLAP and read_at[table] is not None:
+        since = read_at[table] - timedelta(seconds=POLL_OVERLAP)
+        if since < ts:
+            return since, None
+    return ts, last_id
+
+
+def past_watermark(table, row) -> bool:
+    ts, last_id = watermarks[table]
+    return row.updated_at > ts or (row.updated_at == ts and last_id is not None and row.id > last_id)
+
+
+def probe_changes(cur) -> Tuple[Optional[datetime], List[bool]]:
+    """
+    Server time of the probe (None if it did not run) and per FEEDS entry:
+    True if the table may have rows past its read position.
+    """
+    if any(watermarks[table] is None for table, *_ in FEEDS):
+        return None, [True] * len(FEEDS)
+    params = {"shards": SHARD_COUNT, "shard": SHARD_INDEX}
+    for table, *_ in FEEDS:
+        params[f"{table}_ts"], params[f"{table}_id"] = read_from(table)
+    change_probe.execute(cur, params)
+    read_time, *changed = cur.fetchone()
+    feed_probes_total.inc("changed" if any(changed) else "idle")
+    return read_time, changed
+
+
+# HA: the leader also keeps its watermarks in Postgres, so whichever replica
+# takes over next resumes exactly where the previous leader stopped
+SHARED_WATERMARKS_DDL = """
+    CREATE TABLE IF NOT EXISTS livin_bot_watermarks (
+        shard integer NOT NULL,
+        feed text NOT NULL,
+        ts timestamptz NOT NULL,
+        last_id text,
+        saved_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (shard, feed)
+    );
+"""
+
+SAVE_SHARED_WATERMARK_SQL = """
+    INSERT INTO livin_bot_watermarks (shard, feed, ts, last_id)
+    VALUES (%(shard)s, %(feed)s, %(ts)s, %(id)s)
+    ON CONFLICT (shard, feed) DO UPDATE
+    SET ts = EXCLUDED.ts, last_id = EXCLUDED.last_id, saved_at = now();
+"""
+
+LOAD_SHARED_WATERMARKS_SQL = """
+    SELECT feed, ts, last_id FROM livin_bot_watermarks WHERE shard = %(shard)s;
+"""
+
+# set on every takeover, cleared once a pass has read the shared watermarks
+shared_restore_pending = threading.Event()
+
+
+def save_watermark(table, cur=None):
+    ts, last_id = watermarks[table]
+    checkpoints.set(f"watermark:{table}", [ts.isoformat(), last_id])
+    if HA_ENABLED and cur is not None:
+        try:
+            cur.execute(SAVE_SHARED_WATERMARK_SQL, {"shard": SHARD_INDEX, "feed": table, "ts": ts, "id": last_id})
+        except psycopg2.extensions.QueryCanceledError:
+            raise
+        except Exception as e:
+            # the local checkpoint still has it; the next page retries
+            print(f"{table}: shared watermark save error:", e)
+
+
+def resume_from(table, ts, last_id, source):
+    """Sets a restored watermark, clamped to CATCHUP_MAX_AGE."""
+    oldest = now_utc() - timedelta(seconds=CATCHUP_MAX_AGE)
+    if ts < oldest:
+        print(f"{table}: {source} {ts.isoformat()} is older than CATCHUP_MAX_AGE, clamped")
+        ts, last_id = oldest, None
+    watermarks[table] = (ts, last_id)
+    # the state index does not cover what was read before: no overlap yet
+    read_at[table] = None
+    print(f"{table}: resuming from {ts.isoformat()} ({source})")
+
+
+def restore_watermarks():
+    """
+    Resumes every feed from its stored watermark. Downtime longer than
+    CATCHUP_MAX_AGE is not replayed: the watermark is clamped to that age.
+    """
+    for table in watermarks:
+        stored = checkpoints.get(f"watermark:{table}")
+        if stored:
+            resume_from(table, datetime.fromisoformat(stored[0]), stored[1], "checkpoint")
+    if HA_ENABLED:
+        shared_restore_pending.set()
+
+
+def restore_shared_watermarks(cur):
+    """
+    HA: takes over the watermarks the previous leader of this shard saved in
+    Postgres; they win over the local checkpoint, which is only as fresh as
+    this replica's own last term.
+    """
+    cur.execute(SHARED_WATERMARKS_DDL)
+    cur.execute(LOAD_SHARED_WATERMARKS_SQL, {"shard": SHARD_INDEX})
+    for table, ts, last_id in cur.fetchall():
+        if table in watermarks:
+            resume_from(table, ts, last_id, "shared watermark")
+
+
+def poll_feed(cur, table, statement, handler, prefetch, max_pages=None):
+    """
+    Processes every row of `table` changed since its watermark (plus the
+    overlap, see read_from). Rows are read in (updatedAt, id) order,
+    POLL_BATCH_SIZE per page, at most POLL_MAX_PAGES pages per tick (the
+    rest is picked up next tick). Returns the number of rows past the
+    watermark.
+    """
+    if watermarks[table] is None:
+        watermarks[table] = fetch_head(cur, table)
+        save_watermark(table, cur)
+        return 0
+
+    seen = 0
+    ts, last_id = read_from(table)
+    for _ in range(max_pages or POLL_MAX_PAGES):
+        rows = statement.fetch(cur, {
+            "ts": ts,
+            "id": last_id,
+            "limit": POLL_BATCH_SIZE,
+            "shards": SHARD_COUNT,
+            "shard": SHARD_INDEX,
+        })
+        if rows:
+            # one batched lookup per page instead of one per row
+            prefetch(cur, rows)
+
+        advanced = False
+        for row in rows:
+            try:
+                with handler_lock:
+                    handler(cur, row)
+            except Exception as e:
+                # one broken row must not block the whole feed
+                print(f"{table} row {row.id} error:", e)
+            ts, last_id = row.updated_at, row.id
+            if past_watermark(table, row):
+                watermarks[table] = (ts, last_id)
+                advanced = True
+                seen += 1
+
+        if advanced:
+            save_watermark(table, cur)
+        if len(rows) < POLL_BATCH_SIZE:
+            break
+    return seen
+
+
+def poll_once(cur, max_pages=None) -> int:
+    """
+    One change-feed pass; returns the number of changed rows read.
+    The wide feed query only runs for tables the probe reports as changed.
+    """
+    if shared_restore_pending.is_set():
+        restore_shared_watermarks(cur)
+        shared_restore_pending.clear()
+    read_time, probed = probe_changes(cur)
+    seen = 0
+    for changed, (table, statement, handler, prefetch) in zip(probed, FEEDS):
+        if changed:
+            seen += poll_feed(cur, table, statement, handler, prefetch, max_pages=max_pages)
+        if read_time is not None:
+            read_at[table] = read_time
+    try:
+        timers.load_if_due(cur)
+    except psycopg2.extensions.QueryCanceledError:
+        raise
+    except Exception as e:
+        print("Timers load error:", e)
+    try:
+        # on the feed's primary cursor, between feed passes (see db.WORKLOADS)
+        daily_aggregates.reconcile_if_due(cur)
+    except psycopg2.extensions.QueryCanceledError:
+        raise
+    except Exception as e:
+        print("Daily aggregates reconcile error:", e)
+    checkpoints.flush_if_due()
+    return seen
+
+
+def catch_up(cur):
+    """First pass after a restart: same feed, larger page budget."""
+    poll_once(cur, max_pages=CATCHUP_MAX_PAGES)
+    checkpoints.flush()
+
+
+# ===================================
+# Timers (departure / arrival driven notifications)
+# ===================================
+
+TIMER_CONTRACTS_SQL = CONTRACTS_SELECT + f"    WHERE c.id = ANY(%(ids)s) AND {shard_filter('c.id')};"
+
+
+def announce_arrival_soon(cur, contract: ContractRow):
+    c = contract
+    if c.status != "CONCLUDED":
+        return
+
+    tenant = extract_person(c.tenant_name, c.tenant_phone, cur=cur, fallback_user_id=c.tenant_id)
+    landlord = extract_person(c.landlord_name, c.landlord_phone, cur=cur, fallback_user_id=c.landlord_id)
+    title = c.title or "Квартира"
+    city = c.city or ""
+    price = format_price(c.cost)
+    link = get_apartment_link(cur, c.apartment_ad_id)
+    link_line = f'\n🔗 <a href="{link}">Открыть объявление</a>' if link else ""
+    summary = f"<b>{title}</b> — {city} | 👤 {tenant['name']} | {to_almaty(c.arrival)}"
+
+    notify("arrival_soon", summary, f"""
+🧳 <b>Скоро заезд</b>
+🕒 Заезд: <b>{to_almaty(c.arrival)}</b>
+
+🏠 {title}
+🌆 {city}
+
+👤 Гость: <b>{tenant['name']}</b>
+📞 {tenant['phone']}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+📅 {fmt_date(c.arrival)} → {fmt_date(c.departure)}
+💰 Цена: <b>{price:,} ₸</b>{link_line}
+""", city=city)
+
+
+def announce_payout_due(cur, contract: ContractRow):
+    c = contract
+    if c.status not in ("CONCLUDED", "COMPLETED"):
+        return
+
+    landlord = extract_person(c.landlord_name, c.landlord_phone, cur=cur, fallback_user_id=c.landlord_id)
+    title = c.title or "Квартира"
+    city = c.city or ""
+    payout_sum = payout_amount(c.cost)
+    summary = f"<b>{title}</b> — {city} | 🏡 {landlord['name']} | {payout_sum:,} ₸"
+
+    notify("payout_due", summary, f"""
+💵 <b>Пора выплатить собственнику</b>
+🕒 Заезд был: <b>{to_almaty(c.arrival)}</b>
+
+🏠 {title}
+🌆 {city}
+
+🏡 Собственник: <b>{landlord['name']}</b>
+📞 {landlord['phone']}
+
+💰 Сумма: <b>{payout_sum:,} ₸</b>
+ID: {c.id}
+""", city=city)
+
+
+def announce_completed(cur, contract: ContractRow):
+    """
+    Departure timer: "completed" once the contract is COMPLETED and its
+    departure has passed; any other state is left to the feed (a row still
+    CONCLUDED and paid must not be announced as "paid" again).
+    """
+    new = contract_state(contract)
+    if not new.flags & COMPLETED_READY:
+        return
+    index = states["contracts"]
+    old = index.get(contract.id)
+    if old == new:
+        return
+    index.put(contract.id, new)
+    if contract_event(old, new) == "completed":
+        announce_contract(cur, contract, "completed")
+
+
+TIMER_HANDLERS = {
+    "completed": announce_completed,
+    "arrival_soon": announce_arrival_soon,
+    "payout_due": announce_payout_due,
+}
+
+
+def fire_timers(cur, due):
+    """Re-reads the contracts behind due timers and lets each handler decide."""
+    timed_execute(cur, "timers_contracts", TIMER_CONTRACTS_SQL, {
+        "ids": pg_array({cid for _, cid in due}),
+        "shards": SHARD_COUNT,
+        "shard": SHARD_INDEX,
+    })
+    rows = {row.id: row for row in (ContractRow(*row) for row in cur.fetchall())}
+    prefetch_contracts(cur, list(rows.values()))
+
+    for kind, cid in due:
+        row = rows.get(cid)
+        if row is None or not row.is_payment_success:  # gone or no longer paid
+            continue
+        try:
+            with handler_lock:
+                TIMER_HANDLERS[kind](cur, row)
+        except Exception as e:
+            print(f"timer {kind} for {cid} error:", e)
+
+
+timers = TimerScheduler(fire_timers)
@@ -0,0 +1,119 @@
+"""Leader election for multi-replica runs."""
+
+import time
+from typing import Callable
+
+import psycopg2
+
+from .checkpoints import checkpoints
+from .config import (
+    HA_ENABLED,
+    LEADER_LOCK_KEY,
+    LEADER_RETRY_INTERVAL,
+    SHARD_COUNT,
+    SHARD_INDEX,
+)
+from .db import DB_CONN, with_db
+from .feed import catch_up, restore_watermarks
+from .report import send_missed_report_on_start
+from .runtime import REPORT_TIMEOUT, spawn_blocking
+
+
+# ===================================
+# High availability (advisory-lock leader election)
+# ===================================
+
+# the lock session asks the server to probe it, so a silently dead leader
+# loses the lock after roughly idle + interval * count seconds
+LEADER_CONN = (
+    DB_CONN
+    + " options='-c tcp_keepalives_idle=10 -c tcp_keepalives_interval=5 -c tcp_keepalives_count=3'"
+)
+
+
+class LeaderElection:
+    """
+    Leadership = holding pg_try_advisory_lock(LEADER_LOCK_KEY, SHARD_INDEX)
+    on a dedicated session. The lock lives and dies with that session: the
+    leader pings it before every pass and steps down when the ping fails,
+    followers retry every LEADER_RETRY_INTERVAL seconds and take over once
+    the old session is gone. With HA disabled the instance is always leader.
+    """
+
+    def __init__(self, enabled: bool, on_acquired: Callable[[], None]):
+        self.enabled = enabled
+        self.on_acquired = on_acquired
+        self.holding = False
+        self._conn = None
+        self._last_attempt = 0.0
+
+    def _drop(self, reason: str):
+        if self.holding:
+            print(f"Leadership lost: {reason}")
+            checkpoints.flush()
+        self.holding = False
+        try:
+            if self._conn is not None:
+                self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+    def is_leader(self) -> bool:
+        if not self.enabled:
+            if not self.holding:
+                self.holding = True
+                self.on_acquired()
+            return True
+
+        if self.holding:
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                return True
+            except Exception as e:
+                self._drop(str(e).strip())
+                return False
+
+        now = time.monotonic()
+        if now - self._last_attempt < LEADER_RETRY_INTERVAL:
+            return False
+        self._last_attempt = now
+        try:
+            if self._conn is None or self._conn.closed:
+                self._conn = psycopg2.connect(LEADER_CONN)
+                self._conn.autocommit = True
+            with self._conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_lock(%s, %s)", (LEADER_LOCK_KEY, SHARD_INDEX))
+                acquired = cur.fetchone()[0]
+        except Exception as e:
+            print("Leader election error:", e)
+            self._drop(str(e).strip())
+            return False
+
+        if not acquired:
+            return False
+        self.holding = True
+        print(f"Became leader for shard {SHARD_INDEX + 1}/{SHARD_COUNT}")
+        self.on_acquired()
+        return True
+
+
+def on_leadership_acquired():
+    """Resumes the feed (and the missed daily report) for a new leader."""
+    # the local checkpoint first, so the feed keeps its place even if the
+    # database is down now; with HA the next pass takes over the shared ones
+    restore_watermarks()
+    try:
+        with_db(catch_up, retries=3)
+    except Exception as e:
+        print("Catch-up error:", e)
+
+    # on every takeover: the 09:00 run may have fallen between two leaders,
+    # and the sent-date check keeps it to one report a day; in the background,
+    # so the poll loop does not wait for DB and Telegram
+    if SHARD_INDEX == 0:
+        spawn_blocking(send_missed_report_on_start, name="Catch-up report", timeout=REPORT_TIMEOUT)
+
+
+leader = LeaderElection(HA_ENABLED, on_leadership_acquired)
@@ -0,0 +1,91 @@
+"""Formatting, Almaty dates and person extraction."""
+
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from .config import ALMATY_TZ
+from .lookups import UNKNOWN_USER, resolve_users
+
+
+# ===================================
+# Helpers
+# ===================================
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+
+def to_almaty(dt):
+    if not dt:
+        return "-"
+    return dt.astimezone(ALMATY_TZ).strftime("%d.%m.%Y %H:%M")
+
+
+def fmt_date(d):
+    if not d:
+        return "-"
+    return d.strftime("%d.%m.%Y")
+
+
+def format_price(cost):
+    # cost / 100 * 1.12
+    return round(cost / 100 * 1.12)
+
+
+def payout_amount(cost):
+    contract_sum = round(cost / 100)      # сумма контракта (без 1.12)
+    return round(contract_sum * 0.97)     # минус 3%
+
+
+def today_almaty():
+    return datetime.now(ALMATY_TZ).date()
+
+
+def yesterday_almaty():
+    return today_almaty() - timedelta(days=1)
+
+
+def almaty_day_bounds(day):
+    """[start, end) of an Almaty calendar day as UTC datetimes."""
+    start = ALMATY_TZ.localize(datetime.combine(day, datetime.min.time()))
+    end = ALMATY_TZ.localize(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def get_user_info(cur, user_id):
+    if not user_id:
+        return dict(UNKNOWN_USER)
+    return resolve_users(cur, [user_id]).get(user_id, UNKNOWN_USER)
+
+
+def person_incomplete(name, phone) -> bool:
+    """True if extract_person() would have to fall back to the users table."""
+    return not name or not phone
+
+
+def extract_person(name, phone, cur=None, fallback_user_id=None):
+    """
+    name/phone as projected from "tenantInformation"/"landlordInformation"
+    (firstName + lastName, phoneNumber or phone; see dal.person_columns)
+    """
+    name = name or "—"
+    phone = phone or "—"
+
+    # if json is incomplete — try users table
+    if cur is not None and fallback_user_id and (name == "—" or phone == "—"):
+        u = get_user_info(cur, fallback_user_id)
+        if name == "—":
+            name = u["name"]
+        if phone == "—":
+            phone = u["phone"]
+
+    return {"name": name, "phone": phone}
+
+
+def batched(rows, size: int):
+    it = iter(rows)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
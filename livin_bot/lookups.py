@@ -0,0 +1,189 @@
+"""Cached bulk lookups of apartment links and users."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from .metrics import CallbackMetric, db_query_seconds
+
+
+# ===================================
+# Lookup caches
+# ===================================
+
+MISSING = object()
+
+APARTMENT_LINK_TTL = int(os.getenv("APARTMENT_LINK_TTL", 3600))
+APARTMENT_LINK_CACHE_SIZE = int(os.getenv("APARTMENT_LINK_CACHE_SIZE", 5000))
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", 600))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+# users that do not exist are re-checked sooner
+USER_NEGATIVE_TTL = int(os.getenv("USER_NEGATIVE_TTL", 120))
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a per-entry TTL and a size bound.
+    get() returns MISSING for absent or expired keys; hits/misses are counted.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def stats(self) -> str:
+        return f"size={len(self._data)} hits={self.hits} misses={self.misses}"
+
+
+def pg_array(values):
+    """
+    Parameter for `col = ANY(%s)` that works for integer and uuid/text keys:
+    strings are sent as an untyped array literal, so Postgres casts it to the
+    column type instead of comparing uuid with text[].
+    """
+    values = list(values)
+    if all(isinstance(v, int) for v in values):
+        return values
+    quoted = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'"{v}"' for v in quoted) + "}"
+
+
+# apartmentId -> listing link ("" when the apartment has no slug)
+apartment_links = TTLCache(APARTMENT_LINK_CACHE_SIZE, APARTMENT_LINK_TTL)
+
+
+def resolve_apartment_links(cur, apartment_ids):
+    """
+    Links for many apartments at once: cached ones are served from memory,
+    the rest are fetched with a single = ANY(...) query.
+    """
+    result = {}
+    missing = []
+    for ap_id in dict.fromkeys(a for a in apartment_ids if a):
+        link = apartment_links.get(ap_id)
+        if link is MISSING:
+            missing.append(ap_id)
+        else:
+            result[ap_id] = link
+
+    if not missing:
+        return result
+
+    try:
+        with db_query_seconds.time("apartment_links"):
+            cur.execute(
+                """
+                SELECT DISTINCT ON ("apartmentId") "apartmentId", slug
+                FROM apartment_identificator
+                WHERE "apartmentId" = ANY(%s)
+                ORDER BY "apartmentId", "createdAt" DESC;
+                """,
+                (pg_array(missing),),
+            )
+        slugs = {str(ap_id): slug for ap_id, slug in cur.fetchall()}
+    except Exception as e:
+        print("resolve_apartment_links error:", e)
+        return result
+
+    for ap_id in missing:
+        slug = slugs.get(str(ap_id))
+        link = f"https://livin.kz/apartment/{slug}" if slug else ""
+        apartment_links.put(ap_id, link)
+        result[ap_id] = link
+    return result
+
+
+def get_apartment_link(cur, apartment_id):
+    if not apartment_id:
+        return ""
+    return resolve_apartment_links(cur, [apartment_id]).get(apartment_id, "")
+
+
+UNKNOWN_USER = {"name": "—", "phone": "—"}
+
+# user id -> {"name", "phone"}; missing users are cached as UNKNOWN_USER
+user_infos = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+CallbackMetric(
+    "livin_lookup_cache_hits_total", "Lookup cache hits", "counter",
+    lambda: {("apartment_links",): apartment_links.hits, ("users",): user_infos.hits},
+    labels=["cache"],
+)
+CallbackMetric(
+    "livin_lookup_cache_misses_total", "Lookup cache misses", "counter",
+    lambda: {("apartment_links",): apartment_links.misses, ("users",): user_infos.misses},
+    labels=["cache"],
+)
+
+
+def resolve_users(cur, user_ids):
+    """
+    Name/phone for many users at once: cached ones from memory,
+    the rest with a single = ANY(...) query.
+    """
+    result = {}
+    missing = []
+    for user_id in dict.fromkeys(u for u in user_ids if u):
+        info = user_infos.get(user_id)
+        if info is MISSING:
+            missing.append(user_id)
+        else:
+            result[user_id] = info
+
+    if not missing:
+        return result
+
+    try:
+        with db_query_seconds.time("users"):
+            cur.execute(
+                """
+                SELECT id, "firstName", "lastName", phone
+                FROM users
+                WHERE id = ANY(%s);
+                """,
+                (pg_array(missing),),
+            )
+        found = {}
+        for user_id, first, last, phone in cur.fetchall():
+            full_name = f"{first or ''} {last or ''}".strip() or "—"
+            found[str(user_id)] = {"name": full_name, "phone": phone or "—"}
+    except Exception as e:
+        print("resolve_users error:", e)
+        return result
+
+    for user_id in missing:
+        info = found.get(str(user_id))
+        if info is None:
+            user_infos.put(user_id, UNKNOWN_USER, ttl=USER_NEGATIVE_TTL)
+            result[user_id] = UNKNOWN_USER
+        else:
+            user_infos.put(user_id, info)
+            result[user_id] = info
+    return result
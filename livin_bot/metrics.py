@@ -0,0 +1,221 @@
+"""Prometheus metrics, the /metrics endpoint and the sampling profiler."""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+# ===================================
+# Metrics (Prometheus text format) + sampling profiler
+# ===================================
+
+# serve /metrics on this port; 0 disables the endpoint
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+# allow POST /debug/profile to sample the next loop iteration
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+METRICS: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels=()):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labels, values)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            v = self._values.get(label_values)
+            if v is None:
+                v = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    v[i] += 1
+            v[-2] += value
+            v[-1] += 1
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        with self._lock:
+            for values, v in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, v):
+                    lines.append(f"{self.name}_bucket{_fmt_labels(names, values + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_fmt_labels(names, values + ('+Inf',))} {v[-1]}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labels, values)} {v[-2]}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labels, values)} {v[-1]}")
+        return lines
+
+
+class CallbackMetric:
+    """Value read at scrape time: fn() -> {label values tuple: number}."""
+
+    def __init__(self, name: str, doc: str, kind: str, fn, labels=()):
+        self.name = name
+        self.doc = doc
+        self.kind = kind
+        self.fn = fn
+        self.labels = tuple(labels)
+        METRICS.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            for values, v in sorted(self.fn().items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labels, values)} {v}")
+        except Exception as e:
+            print(f"metric {self.name} error:", e)
+        return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+db_connect_seconds = Histogram("livin_db_connect_seconds", "Time to open a new DB connection")
+db_query_seconds = Histogram("livin_db_query_seconds", "DB statement latency", ["statement"])
+db_errors_total = Counter("livin_db_errors_total", "with_db failures by kind", ["kind"])
+tg_send_seconds = Histogram("livin_telegram_send_seconds", "Telegram sendMessage latency")
+tg_responses_total = Counter("livin_telegram_responses_total", "Telegram responses by HTTP status", ["status"])
+tg_retries_total = Counter("livin_telegram_retries_total", "Telegram messages re-queued for another attempt", ["reason"])
+tg_dropped_total = Counter("livin_telegram_dropped_total", "Telegram messages given up on")
+events_total = Counter("livin_events_total", "Status changes detected", ["table", "status"])
+feed_probes_total = Counter("livin_feed_probes_total", "Change probes by outcome", ["result"])
+loop_seconds = Histogram("livin_loop_iteration_seconds", "Duration of one change-feed pass")
+
+
+def timed_execute(cur, statement: str, sql: str, params=None):
+    """cur.execute() recorded in livin_db_query_seconds under `statement`."""
+    with db_query_seconds.time(statement):
+        cur.execute(sql, params)
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of the calling thread every `interval` seconds while
+    active, then prints the hottest stacks. Meant for a single iteration.
+    """
+
+    def __init__(self, interval: float = 0.005, top: int = 15):
+        self.interval = interval
+        self.top = top
+        self._stacks: Dict[tuple, int] = {}
+        self._stop = threading.Event()
+        self._target = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None and len(stack) < 30:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            key = tuple(reversed(stack))
+            self._stacks[key] = self._stacks.get(key, 0) + 1
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        total = sum(self._stacks.values()) or 1
+        print(f"Profile: {total} samples every {self.interval * 1000:.0f}ms")
+        for stack, n in sorted(self._stacks.items(), key=lambda kv: -kv[1])[:self.top]:
+            print(f"  {n * 100 / total:5.1f}%  " + " > ".join(stack[-6:]))
+        return False
+
+
+profile_requested = threading.Event()
+
+
+async def _handle_metrics(reader, writer):
+    """Minimal HTTP/1.0 responder: GET /metrics, POST /debug/profile."""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            pass  # headers are not needed
+        method, path = (request_line.decode("latin-1").split() + ["", ""])[:2]
+
+        if method == "GET" and path == "/metrics":
+            status, ctype, body = "200 OK", "text/plain; version=0.0.4", render_metrics().encode()
+        elif method == "POST" and path == "/debug/profile" and PROFILER_ENABLED:
+            profile_requested.set()
+            status, ctype, body = "202 Accepted", "text/plain", b"profiling the next iteration, see logs\n"
+        else:
+            status, ctype, body = "404 Not Found", "text/plain", b"not found\n"
+
+        writer.write(
+            f"HTTP/1.0 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except Exception:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server():
+    if not METRICS_PORT:
+        return None
+    server = await asyncio.start_server(_handle_metrics, "0.0.0.0", METRICS_PORT)
+    print(f"Metrics on :{METRICS_PORT}/metrics")
+    return server
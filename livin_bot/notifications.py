@@ -0,0 +1,117 @@
+"""Event notifications with optional burst coalescing."""
+
+import threading
+from typing import Dict, List
+
+from .config import COALESCE_MAX_ITEMS, COALESCE_WINDOW
+from .routing import router
+from .runtime import call_later
+from .telegram import MessageChunker, PRIORITY_NORMAL, send
+
+
+# ===================================
+# Notifications (burst coalescing)
+# ===================================
+
+# Event kind -> digest group header
+EVENT_LABELS = {
+    "request_created": "✉️ <b>Заявка отправлена</b>",
+    "request_accepted": "✅ <b>Заявка принята собственником</b>",
+    "request_rejected": "❌ <b>Заявка отклонена</b>",
+    "contract_created": "📄 <b>Контракт создан</b>",
+    "paid": "💳 <b>Бронь оплачена</b>",
+    "payment_failed": "💥 <b>Оплата не прошла</b>",
+    "retry_failed": "💥 <b>Повторная оплата не прошла</b>",
+    "completed": "🏁 <b>Проживание завершено</b>",
+    "contract_rejected": "❌ <b>Контракт отменён</b>",
+    "frozen": "🧊 <b>Контракт заморожен</b>",
+    "arrival_soon": "🧳 <b>Скоро заезд</b>",
+    "payout_due": "💵 <b>Пора выплатить собственнику</b>",
+}
+
+
+class Coalescer:
+    """
+    Leading-edge burst coalescing, per chat. The first event a chat gets
+    after a quiet period is sent at once and opens a window of `window`
+    seconds for that chat; events arriving inside the window are held and,
+    when it closes, go out as one message (the full text if there is only
+    one, else a digest grouped by kind). A window that flushed something is
+    reopened, so a sustained burst costs one message per window and chat.
+    """
+
+    def __init__(self, window: float, max_items: int):
+        self.window = window
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._open = set()                      # chats with an open window
+        self._held: Dict[int, List[tuple]] = {}  # chat -> [(kind, summary, text, priority)]
+
+    def add(self, kind: str, summary: str, text: str, priority: int, chats):
+        now = []
+        with self._lock:
+            for chat_id in chats:
+                if chat_id in self._open:
+                    self._held.setdefault(chat_id, []).append((kind, summary, text, priority))
+                else:
+                    self._open_window(chat_id)
+                    now.append(chat_id)
+        if now:
+            send(text, priority, now)
+
+    def _open_window(self, chat_id: int):
+        self._open.add(chat_id)
+        call_later(self.window, self._close_window, chat_id)
+
+    def _close_window(self, chat_id: int):
+        with self._lock:
+            held = self._held.pop(chat_id, [])
+            if held:
+                self._open_window(chat_id)
+            else:
+                self._open.discard(chat_id)
+        if not held:
+            return
+        try:
+            if len(held) == 1:
+                _, _, text, priority = held[0]
+                send(text, priority, [chat_id])
+            else:
+                self._send_digest(chat_id, held)
+        except Exception as e:
+            print("Digest error:", e)
+
+    def _send_digest(self, chat_id: int, held):
+        priority = min(p for _, _, _, p in held)
+        groups: Dict[str, List[str]] = {}
+        # payment failures first, then arrival order
+        for kind, summary, _, _ in sorted(held, key=lambda e: e[3]):
+            groups.setdefault(kind, []).append(summary)
+
+        out = MessageChunker(lambda chunk: send(chunk, priority, [chat_id]))
+        out.add(f"📦 <b>Сводка событий: {len(held)}</b> (за {self.window:g} сек)\n\n")
+        for kind, summaries in groups.items():
+            block = f"{EVENT_LABELS.get(kind, kind)} — {len(summaries)}\n"
+            block += "".join(f"• {s}\n" for s in summaries[:self.max_items])
+            if len(summaries) > self.max_items:
+                block += f"+{len(summaries) - self.max_items} ещё\n"
+            out.add(block + "\n")
+        out.flush()
+
+
+coalescer = Coalescer(COALESCE_WINDOW, COALESCE_MAX_ITEMS) if COALESCE_WINDOW > 0 else None
+
+
+def notify(kind: str, summary: str, text: str, priority: int = PRIORITY_NORMAL, city: str = ""):
+    """
+    Sends one event notification to the chats subscribed to `kind` in
+    `city`: `text` is the full message, `summary` its one-line form used
+    when the event ends up in a digest.
+    """
+    chats = router.chats_for(kind, city)
+    if not chats:
+        return
+    if coalescer is None:
+        send(text, priority, chats)
+    else:
+        coalescer.add(kind, summary, (text or "").strip(), priority, chats)
@@ -0,0 +1,55 @@
+"""LISTEN/NOTIFY setup for push mode."""
+
+import psycopg2
+
+from .db import DB_CONN
+
+
+# ===================================
+# Push mode (LISTEN/NOTIFY)
+# ===================================
+
+NOTIFY_CHANNEL = "livin_bot_changes"
+
+NOTIFY_FUNCTION_SQL = f"""
+CREATE OR REPLACE FUNCTION livin_bot_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        '{NOTIFY_CHANNEL}',
+        json_build_object('table', TG_TABLE_NAME, 'id', NEW.id, 'status', NEW.status)::text
+    );
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def install_notify_triggers(cur):
+    """Creates the pg_notify trigger on both tables (idempotent)."""
+    cur.execute(NOTIFY_FUNCTION_SQL)
+    for table in ("contract_requests", "contracts"):
+        cur.execute(
+            """
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = 'livin_bot_notify' AND tgrelid = %s::regclass;
+            """,
+            (table,),
+        )
+        if cur.fetchone():
+            continue
+        cur.execute(
+            f"""
+            CREATE TRIGGER livin_bot_notify
+            AFTER INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE livin_bot_notify();
+            """
+        )
+        print(f"Push mode: installed notify trigger on {table}")
+
+
+def open_listen_connection():
+    conn = psycopg2.connect(DB_CONN)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute(f"LISTEN {NOTIFY_CHANNEL};")
+    return conn
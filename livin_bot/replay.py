@@ -0,0 +1,223 @@
+"""
+Replay CLI: re-sends notifications for rows changed in a time range.
+
+    python -m livin_bot replay --since 2024-03-01 --until 2024-04-01 [--dry-run]
+
+Rows are read in keyset pages in ("updatedAt", id) order and rendered
+with the live templates, each as the notification its current state
+stands for (the tables keep no history of earlier states). Progress
+is checkpointed per table and range, so rerunning the same command resumes
+where it stopped; --from-start ignores the checkpoint.
+"""
+
+import argparse
+import asyncio
+import atexit
+import time
+from collections import Counter as Tally
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .checkpoints import checkpoints
+from .config import ALMATY_TZ, validate
+from .dal import CONTRACTS_SELECT, REQUESTS_SELECT, ContractRow, RequestRow
+from .db import REPORT_ITERSIZE, with_db
+from .feed import (
+    announce_contract,
+    announce_request,
+    contract_event,
+    contract_state,
+    prefetch_contracts,
+    prefetch_requests,
+    request_event,
+    request_state,
+)
+from .metrics import timed_execute
+from .routing import router
+from .runtime import bind_loop, run_blocking
+from .telegram import PRIORITY_NORMAL, MessageChunker, TokenBucket, outbound, send
+
+
+# ===================================
+# Replay / backfill
+# ===================================
+
+# keep at most this many messages queued; the cursor waits for the sender
+REPLAY_MAX_QUEUE = 200
+PROGRESS_INTERVAL = 5
+
+REPLAY_WHERE = """    WHERE {a}."updatedAt" >= %(ts)s
+      AND ({a}."updatedAt" > %(ts)s OR %(id)s IS NULL OR {a}.id > %(id)s)
+      AND {a}."updatedAt" < %(until)s
+    ORDER BY {a}."updatedAt", {a}.id
+    LIMIT %(limit)s
+"""
+
+# table -> (query, row record, prefetch, state, event, announce)
+REPLAY_TABLES = {
+    "contract_requests": (
+        REQUESTS_SELECT + REPLAY_WHERE.format(a="r"),
+        RequestRow, prefetch_requests, request_state, request_event, announce_request,
+    ),
+    "contracts": (
+        CONTRACTS_SELECT + REPLAY_WHERE.format(a="c"),
+        ContractRow, prefetch_contracts, contract_state, contract_event, announce_contract,
+    ),
+}
+
+
+class ReplaySender:
+    """
+    Stands in for notify(): routes like the live bot (or to --chat), counts,
+    and unless dry-running feeds the outbound queue at no more than `rate`
+    messages/s. With `digest`, each chat gets the one-line summaries packed
+    into as few messages as Telegram allows instead of the full texts.
+    """
+
+    def __init__(self, dry_run: bool, chats: Optional[List[int]], rate: float, digest: bool):
+        self.dry_run = dry_run
+        self.chats = chats
+        self.digest = digest
+        self.bucket = TokenBucket(rate, 1)
+        self.events = Tally()
+        self.messages = Tally()
+        self._digests: Dict[int, MessageChunker] = {}
+
+    def _send(self, text: str, priority: int, chat_id: int):
+        self.messages[chat_id] += 1
+        if self.dry_run:
+            return
+        while outbound.depth() >= REPLAY_MAX_QUEUE:
+            time.sleep(0.2)
+        wait = self.bucket.wait_time(time.monotonic())
+        if wait > 0:
+            time.sleep(wait)
+        self.bucket.consume()
+        send(text, priority, [chat_id])
+
+    def notify(self, kind: str, summary: str, text: str, priority: int = PRIORITY_NORMAL, city: str = ""):
+        self.events[kind] += 1
+        for chat_id in self.chats or router.chats_for(kind, city):
+            if not self.digest:
+                self._send(text, priority, chat_id)
+                continue
+            out = self._digests.get(chat_id)
+            if out is None:
+                out = self._digests[chat_id] = MessageChunker(
+                    lambda chunk, chat_id=chat_id: self._send(chunk, PRIORITY_NORMAL, chat_id)
+                )
+                out.add("🔁 <b>Повтор уведомлений</b>\n\n")
+            out.add(f"• {summary}\n")
+
+    def flush(self):
+        for out in self._digests.values():
+            out.flush()
+        self._digests.clear()
+
+
+def replay_table(cur, table: str, since: datetime, until: datetime, sender: ReplaySender, position: list):
+    """
+    Reads `table` from `position` ([updatedAt, id], updated in place so a
+    with_db retry resumes) up to `until`, REPORT_ITERSIZE rows per page.
+    Each page is its own short keyset query: the statement timeout applies
+    per page, and nothing holds a snapshot or builds the whole range first.
+    """
+    sql, row_type, prefetch, state_fn, event_fn, announce = REPLAY_TABLES[table]
+    key = f"replay:{table}:{since.isoformat()}:{until.isoformat()}"
+    span = max((until - since).total_seconds(), 1)
+    rows_done = 0
+    started = last_report = time.monotonic()
+
+    params = {"until": until, "limit": REPORT_ITERSIZE}
+    while True:
+        params["ts"], params["id"] = position
+        timed_execute(cur, f"replay_{table}", sql, params)
+        batch = [row_type(*row) for row in cur.fetchall()]
+        if not batch:
+            break
+        prefetch(cur, batch)
+        for row in batch:
+            event = event_fn(None, state_fn(row))
+            if event is not None:
+                try:
+                    announce(cur, row, event, notify=sender.notify)
+                except Exception as e:
+                    print(f"{table} row {row.id} error:", e)
+            position[:] = [row.updated_at, row.id]
+            rows_done += 1
+
+        if not sender.dry_run:
+            checkpoints.set(key, [position[0].isoformat(), position[1]])
+        now = time.monotonic()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            checkpoints.flush_if_due()
+            done = (position[0] - since).total_seconds() / span * 100
+            print(
+                f"{table}: {rows_done} rows ({rows_done / (now - started):.0f}/s), "
+                f"at {position[0].isoformat()} ({done:.1f}%), {sum(sender.messages.values())} messages"
+            )
+        if len(batch) < REPORT_ITERSIZE:
+            break
+
+    sender.flush()
+    checkpoints.flush()
+    print(f"{table}: done, {rows_done} rows in {time.monotonic() - started:.1f}s")
+
+
+def parse_time(value: str) -> datetime:
+    """ISO date or datetime; without an offset it is Almaty time."""
+    dt = datetime.fromisoformat(value)
+    return ALMATY_TZ.localize(dt) if dt.tzinfo is None else dt
+
+
+async def run(args):
+    bind_loop(asyncio.get_running_loop())
+    sender = ReplaySender(args.dry_run, args.chat, args.rate, args.digest)
+    tables = list(REPLAY_TABLES) if args.table == "all" else [args.table]
+    if not args.dry_run:
+        outbound.start()
+
+    try:
+        for table in tables:
+            position = [args.since, None]
+            stored = checkpoints.get(f"replay:{table}:{args.since.isoformat()}:{args.until.isoformat()}")
+            if stored and not args.from_start and not args.dry_run:
+                position = [datetime.fromisoformat(stored[0]), stored[1]]
+                print(f"{table}: resuming after {stored[0]} / {stored[1]}")
+            await run_blocking(
+                lambda: with_db(
+                    lambda cur: replay_table(cur, table, args.since, args.until, sender, position),
+                    workload="report",
+                ),
+                name=f"Replay {table}", timeout=None,
+            )
+    finally:
+        if not args.dry_run:
+            while outbound.depth():
+                print(f"waiting for {outbound.depth()} queued messages...")
+                await outbound.drain(PROGRESS_INTERVAL)
+            await outbound.stop()
+
+    print("Events:", dict(sender.events) or "none")
+    print(("Would send: " if args.dry_run else "Sent: ") + str(dict(sender.messages) or "nothing"))
+
+
+def main(argv):
+    ap = argparse.ArgumentParser(prog="python -m livin_bot replay", description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--since", type=parse_time, required=True, help="inclusive, ISO (Almaty time unless offset given)")
+    ap.add_argument("--until", type=parse_time, required=True, help="exclusive")
+    ap.add_argument("--table", choices=["all", *REPLAY_TABLES], default="all")
+    ap.add_argument("--chat", type=int, action="append", help="send only here (repeatable) instead of routing")
+    ap.add_argument("--rate", type=float, default=5, help="messages per second")
+    ap.add_argument("--digest", action="store_true", help="pack one-line summaries instead of full messages")
+    ap.add_argument("--dry-run", action="store_true", help="only count what would be sent")
+    ap.add_argument("--from-start", action="store_true", help="ignore the resume checkpoint")
+    args = ap.parse_args(argv)
+    if args.until <= args.since:
+        ap.error("--until must be after --since")
+
+    validate()
+    router.compile()
+    atexit.register(checkpoints.flush)
+    asyncio.run(run(args))
@@ -0,0 +1,138 @@
+"""The 09:00 daily report."""
+
+import threading
+from datetime import datetime
+
+from .aggregates import daily_aggregates
+from .checkpoints import checkpoints
+from .config import ALMATY_TZ, HA_ENABLED, SHARD_COUNT
+from .db import with_db
+from .helpers import format_price, payout_amount, today_almaty, yesterday_almaty
+from .lookups import apartment_links, user_infos
+from .routing import router
+from .telegram import MessageChunker, send
+
+
+# ===================================
+# Daily report
+# ===================================
+
+def daily_report():
+    """
+    Renders the report from daily_aggregates; no contracts query unless a
+    needed day was never reconciled (first start) or the feed is sharded
+    (this instance only observes its own shard).
+    """
+    today = today_almaty()
+    yesterday = yesterday_almaty()
+    days = [yesterday.isoformat(), today.isoformat()]
+
+    try:
+        if SHARD_COUNT > 1 or not all(daily_aggregates.is_reconciled(d) for d in days):
+            with_db(lambda cur: daily_aggregates.reconcile(cur, days), workload="report")
+    except Exception as e:
+        print("Daily report error:", e)
+        return False
+
+    bookings_yesterday, _ = daily_aggregates.snapshot(days[0])
+    _, arrivals = daily_aggregates.snapshot(days[1])
+    _, payouts = daily_aggregates.snapshot(days[0])
+
+    chats = router.chats_for("daily_report")
+    out = MessageChunker(lambda chunk: send(chunk, chats=chats))
+
+    # ---------- 1) БРОНИРОВАНИЯ ЗА ВЧЕРА ----------
+    out.add(f"📊 <b>Ежедневная сводка за {yesterday.strftime('%d.%m.%Y')}</b>\n\n")
+    out.add(f"📌 <b>Бронирований за вчера:</b> {bookings_yesterday}\n\n")
+
+    # ---------- 2) ЗАЕЗДЫ СЕГОДНЯ ----------
+    out.add("🏨 <b>Предстоящие заезды сегодня:</b>\n")
+    for idx, a in enumerate(arrivals, 1):
+        price = format_price(a["cost"])
+        link_line = f'\n      🔗 <a href="{a["link"]}">Открыть объявление</a>' if a["link"] else ""
+        out.add(
+            f"{idx}) <b>{a['title']}</b> — {a['city']}\n"
+            f"   👤 Гость: <b>{a['tenant'][0]}</b>  | 📞 {a['tenant'][1]}\n"
+            f"   🏡 Собственник: <b>{a['landlord'][0]}</b>  | 📞 {a['landlord'][1]}\n"
+            f"   📅 Даты: {a['arr']} → {a['dep']}\n"
+            f"   💰 Цена: <b>{price:,} ₸</b>{link_line}\n\n"
+        )
+    if not arrivals:
+        out.add("— нет заездов сегодня\n\n")
+
+    # ---------- 3) ВЫПЛАТЫ СЕГОДНЯ (заезд был вчера) ----------
+    out.add("💵 <b>Выплаты сегодня:</b>\n")
+    total_payout = 0
+    for idx, p in enumerate(payouts, 1):
+        payout_sum = payout_amount(p["cost"])
+        total_payout += payout_sum
+        out.add(
+            f"{idx}) <b>{p['title']}</b> — {p['city']}\n"
+            f"   🏡 Собственник: <b>{p['landlord'][0]}</b>  | 📞 {p['landlord'][1]}\n"
+            f"   Сумма: <b>{payout_sum:,} ₸</b>\n"
+        )
+    if payouts:
+        out.add(f"\n💰 <b>Итого выплат:</b> {total_payout:,} ₸\n")
+    else:
+        out.add("— сегодня выплат нет\n")
+
+    out.flush()
+    print(f"Lookup caches: links {apartment_links.stats()}, users {user_infos.stats()}")
+    return True
+
+
+# the startup catch-up and the 09:00 run must not both send it
+_report_lock = threading.Lock()
+
+# HA: the sent date lives in Postgres next to livin_bot_watermarks, so a
+# leader elected after 09:00 sees whether its predecessor already sent it
+REPORTS_SENT_DDL = """
+    CREATE TABLE IF NOT EXISTS livin_bot_reports_sent (
+        report_date date PRIMARY KEY,
+        sent_at timestamptz NOT NULL DEFAULT now()
+    );
+"""
+
+
+def _shared_report_sent(cur, day: str) -> bool:
+    cur.execute(REPORTS_SENT_DDL)
+    cur.execute("SELECT 1 FROM livin_bot_reports_sent WHERE report_date = %s;", (day,))
+    return cur.fetchone() is not None
+
+
+def _mark_shared_report_sent(cur, day: str):
+    cur.execute(REPORTS_SENT_DDL)
+    cur.execute("INSERT INTO livin_bot_reports_sent (report_date) VALUES (%s) ON CONFLICT DO NOTHING;", (day,))
+
+
+def daily_report_once():
+    """Sends today's report unless it is recorded as sent already."""
+    with _report_lock:
+        today = today_almaty().isoformat()
+        try:
+            # the primary: the replica may lag behind the last leader's write
+            sent = (with_db(lambda cur: _shared_report_sent(cur, today), retries=3) if HA_ENABLED
+                    else checkpoints.get("daily_report:last_date") == today)
+        except Exception as e:
+            print("Daily report check error:", e)
+            return
+        if sent:
+            print("Daily report for today already sent, skipping")
+            return
+        if daily_report():
+            checkpoints.set("daily_report:last_date", today)
+            checkpoints.flush()
+            if HA_ENABLED:
+                try:
+                    with_db(lambda cur: _mark_shared_report_sent(cur, today), retries=3)
+                except Exception as e:
+                    print("Daily report mark error:", e)
+
+
+def send_missed_report_on_start():
+    # If bot starts (or takes over) after 09:00 Almaty — send yesterday report
+    # immediately, unless today's report is recorded as sent already.
+    now = datetime.now(ALMATY_TZ)
+    if now.hour >= 9:
+        print("Startup: after 09:00, sending daily report (catch-up)")
+        daily_report_once()
@@ -0,0 +1,112 @@
+"""Per-chat subscriptions: which chats get which events, optionally per city."""
+
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+from .config import CHAT_IDS
+
+
+# ===================================
+# Routing (per-chat subscriptions)
+# ===================================
+
+# JSON object: chat id -> {"events": [...], "cities": [...]}; a missing or
+# "*" list means "all". Chats without a rule get everything, e.g.
+#   {"-100111": {"events": ["paid", "payment_failed", "retry_failed", "daily_report"]},
+#    "-100222": {"cities": ["Алматы"]}}
+# The daily report covers all cities, so "cities" does not filter it.
+TELEGRAM_ROUTES = os.getenv("TELEGRAM_ROUTES", "").strip()
+
+ROUTED_EVENTS = (
+    "request_created",
+    "request_accepted",
+    "request_rejected",
+    "contract_created",
+    "paid",
+    "payment_failed",
+    "retry_failed",
+    "completed",
+    "contract_rejected",
+    "frozen",
+    "arrival_soon",
+    "payout_due",
+    "daily_report",
+)
+
+ANY_CITY = None
+
+
+def city_key(city: Optional[str]) -> str:
+    return (city or "").strip().casefold()
+
+
+class Router:
+    """
+    Subscription rules compiled into {(event, city key): chat ids}.
+    (event, ANY_CITY) holds the chats taking that event from any city; an
+    entry for a named city already includes them, so chats_for() is at
+    most two dict lookups and never walks the rules.
+    """
+
+    def __init__(self, raw: str, chat_ids):
+        self.raw = raw
+        self.chat_ids = list(chat_ids)
+        self._index: Optional[Dict[Tuple[str, Optional[str]], Tuple[int, ...]]] = None
+
+    def compile(self):
+        """Parses and indexes the rules; raises ValueError on a malformed config."""
+        rules = json.loads(self.raw) if self.raw else {}
+        if not isinstance(rules, dict):
+            raise ValueError("TELEGRAM_ROUTES must be a JSON object keyed by chat id")
+
+        for chat, rule in rules.items():
+            if not isinstance(rule, dict):
+                raise ValueError(f"TELEGRAM_ROUTES: rule for chat {chat} must be an object")
+            for key in ("events", "cities"):
+                value = rule.get(key, "*")
+                if value != "*" and not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+                    raise ValueError(f'TELEGRAM_ROUTES: "{key}" for chat {chat} must be a list of strings or "*"')
+
+        any_city: Dict[str, list] = {e: [] for e in ROUTED_EVENTS}
+        by_city: Dict[Tuple[str, str], list] = {}
+        for chat_id in self.chat_ids:
+            rule = rules.get(str(chat_id), {})
+            events = rule.get("events", "*")
+            cities = rule.get("cities", "*")
+            if events == "*":
+                events = ROUTED_EVENTS
+            unknown = set(events) - set(ROUTED_EVENTS)
+            if unknown:
+                raise ValueError(f"TELEGRAM_ROUTES: unknown events for chat {chat_id}: {sorted(unknown)}")
+            for event in events:
+                if cities == "*" or event == "daily_report":
+                    any_city[event].append(chat_id)
+                else:
+                    for city in cities:
+                        by_city.setdefault((event, city_key(city)), []).append(chat_id)
+
+        for chat in set(rules) - {str(c) for c in self.chat_ids}:
+            print(f"TELEGRAM_ROUTES: chat {chat} is not in TELEGRAM_CHAT_IDS, rule ignored")
+
+        index: Dict[Tuple[str, Optional[str]], Tuple[int, ...]] = {
+            (event, ANY_CITY): tuple(chats) for event, chats in any_city.items()
+        }
+        for (event, city), chats in by_city.items():
+            # keep CHAT_IDS order, no duplicates
+            wanted = set(chats) | set(any_city[event])
+            index[(event, city)] = tuple(c for c in self.chat_ids if c in wanted)
+        self._index = index
+        return self
+
+    def chats_for(self, event: str, city: Optional[str] = None) -> Tuple[int, ...]:
+        if self._index is None:
+            self.compile()
+        if city:
+            chats = self._index.get((event, city_key(city)))
+            if chats is not None:
+                return chats
+        return self._index.get((event, ANY_CITY), tuple(self.chat_ids))
+
+
+router = Router(TELEGRAM_ROUTES, CHAT_IDS)
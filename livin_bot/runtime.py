@@ -0,0 +1,103 @@
+"""Event loop plumbing: the blocking-work executor and thread-safe loop calls."""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+
+# ===================================
+# Runtime (asyncio)
+# ===================================
+
+# Polling, scheduling and sending run as tasks on one event loop. psycopg2
+# is blocking, so DB work goes to this small executor; every job is awaited
+# with a timeout and its running statement is cancelled when it overruns.
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", 2))
+POLL_TIMEOUT = int(os.getenv("POLL_TIMEOUT", 120))
+REPORT_TIMEOUT = int(os.getenv("REPORT_TIMEOUT", 600))
+# on shutdown, wait this long (seconds) for queued messages to go out
+SHUTDOWN_DRAIN_TIMEOUT = int(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", 10))
+
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="db")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# executor thread id -> connection it is currently using (see with_db)
+_active_conns: Dict[int, Any] = {}
+
+
+def bind_loop(loop: asyncio.AbstractEventLoop):
+    global _loop
+    _loop = loop
+
+
+def call_on_loop(fn, *args):
+    """Runs fn(*args) on the event loop: right away on the loop thread, else scheduled."""
+    loop = _loop
+    if loop is None:
+        raise RuntimeError("event loop is not running")
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        fn(*args)
+    else:
+        loop.call_soon_threadsafe(fn, *args)
+
+
+def call_later(delay: float, fn, *args):
+    """loop.call_later() that may be called from any thread."""
+    call_on_loop(lambda: _loop.call_later(delay, fn, *args))
+
+
+# tasks started by spawn_blocking(); referenced here so they are not collected
+_background: set = set()
+
+
+async def run_blocking(fn, *args, name: str, timeout: float):
+    """
+    Runs blocking fn(*args) in blocking_executor. After `timeout` seconds the
+    statement the job is running is cancelled (QueryCanceledError inside the
+    job), and the job is still awaited, so the same work never runs twice
+    at once.
+    """
+    thread = {}
+
+    def _job():
+        thread["id"] = threading.get_ident()
+        return fn(*args)
+
+    fut = asyncio.get_running_loop().run_in_executor(blocking_executor, _job)
+    try:
+        return await asyncio.wait_for(asyncio.shield(fut), timeout)
+    except asyncio.TimeoutError:
+        print(f"{name} exceeded {timeout}s, cancelling its query")
+        conn = _active_conns.get(thread.get("id"))
+        if conn is not None:
+            try:
+                conn.cancel()
+            except Exception as e:
+                print(f"{name}: cancel failed:", e)
+        return await fut
+
+
+def spawn_blocking(fn, *args, name: str, timeout: float):
+    """
+    Starts run_blocking(fn, *args) as a background task without waiting for
+    it; may be called from any thread. Errors are logged, never raised.
+    """
+    async def _run():
+        try:
+            await run_blocking(fn, *args, name=name, timeout=timeout)
+        except Exception as e:
+            print(f"{name} error:", e)
+
+    def _start():
+        task = _loop.create_task(_run())
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+    call_on_loop(_start)
@@ -0,0 +1,198 @@
+"""Heap scheduler for notifications due at a point in time rather than on a row change."""
+
+import asyncio
+import heapq
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .checkpoints import checkpoints
+from .config import CATCHUP_MAX_AGE, SHARD_COUNT, SHARD_INDEX
+from .dal import shard_filter
+from .db import with_db
+from .helpers import now_utc
+from .metrics import Counter, timed_execute
+from .runtime import POLL_TIMEOUT, call_on_loop, run_blocking
+
+
+# ===================================
+# Timers (departure / arrival driven notifications)
+# ===================================
+
+# timers are loaded this far ahead (seconds); the change feed keeps them
+# current in between, so the look-ahead query runs about twice per window
+TIMER_LOOKAHEAD = int(os.getenv("TIMER_LOOKAHEAD", 6 * 3600))
+# "arrival_soon" fires this many seconds before "arrivalDate"
+ARRIVAL_NOTICE_LEAD = int(os.getenv("ARRIVAL_NOTICE_LEAD", 2 * 3600))
+# "payout_due" fires this many seconds after "arrivalDate"
+PAYOUT_DUE_AFTER = int(os.getenv("PAYOUT_DUE_AFTER", 24 * 3600))
+# comma-separated subset of: completed, arrival_soon, payout_due
+TIMER_EVENTS = {
+    e.strip() for e in os.getenv("TIMER_EVENTS", "completed,arrival_soon,payout_due").split(",") if e.strip()
+}
+
+# only this shard's contracts: the other shards' leaders own theirs
+TIMERS_SQL = f"""
+    SELECT id, status, "isPaymentSuccess", "arrivalDate", "departureDate"
+    FROM contracts
+    WHERE "isPaymentSuccess" = true
+      AND status IN ('CONCLUDED', 'COMPLETED')
+      AND (("departureDate" > %(start)s AND "departureDate" <= %(end)s)
+           OR ("arrivalDate" > %(arr_start)s AND "arrivalDate" <= %(arr_end)s))
+      AND {shard_filter('id')}
+"""
+
+timers_fired_total = Counter("livin_timers_fired_total", "Time-triggered notifications checked", ["kind"])
+
+
+def timer_due_times(status, paid, arrival, departure) -> Dict[str, datetime]:
+    """kind -> when it is due, for the timers a contract in this state needs."""
+    due = {}
+    if not paid or status not in ("CONCLUDED", "COMPLETED"):
+        return due
+    if departure is not None:
+        due["completed"] = departure
+    if arrival is not None:
+        if status == "CONCLUDED":
+            due["arrival_soon"] = arrival - timedelta(seconds=ARRIVAL_NOTICE_LEAD)
+        due["payout_due"] = arrival + timedelta(seconds=PAYOUT_DUE_AFTER)
+    return {kind: at for kind, at in due.items() if kind in TIMER_EVENTS}
+
+
+class TimerScheduler:
+    """
+    Min-heap of (due, seq, contract id, kind), fired on the event loop.
+
+    load() fills it from one look-ahead query over (fired_until, now +
+    TIMER_LOOKAHEAD]; later calls only read the newly uncovered slice.
+    Between loads the change feed calls observe() for every contract row,
+    which schedules, moves or cancels that contract's timers. Moved and
+    cancelled entries stay in the heap and are skipped when popped
+    (self._due holds the live due time per (id, kind)).
+
+    fired_until (checkpointed) is the time everything up to which has been
+    handled, so a restart neither repeats nor, within CATCHUP_MAX_AGE,
+    loses timers. `fire(cur, [(kind, id), ...])` does the actual work.
+    """
+
+    def __init__(self, fire: Callable[[object, List[Tuple[str, str]]], None]):
+        self.fire = fire
+        self._lock = threading.Lock()
+        self._heap: list = []
+        self._due: Dict[Tuple[str, str], datetime] = {}
+        self._seq = 0
+        self._horizon: Optional[datetime] = None
+        self._fired_until: Optional[datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _schedule(self, cid, status, paid, arrival, departure) -> bool:
+        """Caller holds the lock; True if the heap head may have moved earlier."""
+        wanted = timer_due_times(status, paid, arrival, departure)
+        earlier = False
+        for kind in TIMER_EVENTS:
+            key = (cid, kind)
+            at = wanted.get(kind)
+            if at is None or not (self._fired_until < at <= self._horizon):
+                self._due.pop(key, None)
+                continue
+            if self._due.get(key) == at:
+                continue
+            self._due[key] = at
+            self._seq += 1
+            earlier = earlier or not self._heap or at < self._heap[0][0]
+            heapq.heappush(self._heap, (at, self._seq, cid, kind))
+        return earlier
+
+    def observe(self, cid, status, paid, arrival, departure):
+        """Applies one contract row from the change feed."""
+        with self._lock:
+            if self._horizon is None:
+                return
+            earlier = self._schedule(cid, status, paid, arrival, departure)
+        if earlier and self._wakeup is not None:
+            call_on_loop(self._wakeup.set)
+
+    def load(self, cur):
+        """Reads the timers due between the loaded horizon and now + TIMER_LOOKAHEAD."""
+        now = now_utc()
+        with self._lock:
+            if self._fired_until is None:
+                stored = checkpoints.get("timers:fired_until")
+                oldest = now - timedelta(seconds=CATCHUP_MAX_AGE)
+                self._fired_until = max(datetime.fromisoformat(stored), oldest) if stored else now
+            start = self._horizon or self._fired_until
+        end = now + timedelta(seconds=TIMER_LOOKAHEAD)
+        if end <= start:
+            return
+
+        timed_execute(cur, "timers_load", TIMERS_SQL, {
+            "start": start,
+            "end": end,
+            "arr_start": start - timedelta(seconds=PAYOUT_DUE_AFTER),
+            "arr_end": end + timedelta(seconds=ARRIVAL_NOTICE_LEAD),
+            "shards": SHARD_COUNT,
+            "shard": SHARD_INDEX,
+        })
+        rows = cur.fetchall()
+        with self._lock:
+            self._horizon = end
+            for cid, status, paid, arrival, departure in rows:
+                self._schedule(cid, status, paid, arrival, departure)
+            pending = len(self._due)
+        if self._wakeup is not None:
+            call_on_loop(self._wakeup.set)
+        print(f"Timers: loaded up to {end.isoformat()}, {pending} pending")
+
+    def load_if_due(self, cur):
+        """Extends the horizon once half of the look-ahead window is used up."""
+        horizon = self._horizon
+        if horizon is None or horizon - now_utc() < timedelta(seconds=TIMER_LOOKAHEAD / 2):
+            self.load(cur)
+
+    def _pop_due(self, now: datetime):
+        """(due entries, seconds until the next one or None)."""
+        due = []
+        with self._lock:
+            while self._heap:
+                at, _, cid, kind = self._heap[0]
+                if self._due.get((cid, kind)) != at:
+                    heapq.heappop(self._heap)  # moved or cancelled
+                    continue
+                if at > now:
+                    return due, (at - now).total_seconds()
+                heapq.heappop(self._heap)
+                del self._due[(cid, kind)]
+                due.append((kind, cid))
+            return due, None
+
+    async def run(self, is_active: Callable[[], bool]):
+        """Sleeps until the next timer; fires due timers while is_active()."""
+        self._wakeup = asyncio.Event()
+        while True:
+            now = now_utc()
+            due, wait = self._pop_due(now)
+            if self._horizon is not None:
+                with self._lock:
+                    self._fired_until = max(self._fired_until, now)
+                checkpoints.set("timers:fired_until", now.isoformat())
+
+            if due and is_active():
+                for kind, _ in due:
+                    timers_fired_total.inc(kind)
+                started = time.monotonic()
+                try:
+                    await run_blocking(
+                        with_db, lambda cur: self.fire(cur, due), name="Timers", timeout=POLL_TIMEOUT
+                    )
+                except Exception as e:
+                    print("Timers error:", e)
+                print(f"Timers: {len(due)} fired in {time.monotonic() - started:.2f}s")
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
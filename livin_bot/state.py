@@ -0,0 +1,116 @@
+"""Per-row state index the change feed diffs incoming rows against."""
+
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from .metrics import CallbackMetric, Counter
+
+
+# ===================================
+# State index (last seen state per contract / request)
+# ===================================
+
+# rows still moving through their lifecycle; least recently changed go first
+STATE_MAX_ACTIVE = int(os.getenv("STATE_MAX_ACTIVE", 100000))
+# rows in a final state, kept only so a later touch is not re-announced
+STATE_MAX_TERMINAL = int(os.getenv("STATE_MAX_TERMINAL", 20000))
+
+# RowState.flags bits
+PAID = 1             # contracts."isPaymentSuccess"
+PAYED_AT = 2         # contracts."payedAt" is set
+COMPLETED_READY = 4  # COMPLETED and the departure date has passed
+
+
+class RowState:
+    """What the feed last saw of one row; about 64 bytes, no per-object dict."""
+
+    __slots__ = ("status", "flags", "retries")
+
+    def __init__(self, status: str, flags: int = 0, retries: int = 0):
+        self.status = status
+        self.flags = flags
+        self.retries = retries
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, RowState)
+            and self.status == other.status
+            and self.flags == other.flags
+            and self.retries == other.retries
+        )
+
+    def __repr__(self):
+        return f"RowState({self.status!r}, flags={self.flags}, retries={self.retries})"
+
+
+state_evictions_total = Counter(
+    "livin_state_evictions_total", "Rows dropped from the state index to stay within its bounds", ["table", "kind"]
+)
+
+
+class StateIndex:
+    """
+    Last seen RowState per row id of one table, bounded in memory.
+
+    Active and terminal rows live in separate LRU maps. Terminal rows (as
+    decided by `is_terminal`) are evicted first and independently, so a
+    backlog of finished contracts never pushes out one that is still
+    waiting for payment. A row missing from the index is treated as new.
+    """
+
+    def __init__(self, table: str, is_terminal, max_active: int, max_terminal: int):
+        self.table = table
+        self.is_terminal = is_terminal
+        self.max_active = max_active
+        self.max_terminal = max_terminal
+        self._active: "OrderedDict[str, RowState]" = OrderedDict()
+        self._terminal: "OrderedDict[str, RowState]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._active) + len(self._terminal)
+
+    def get(self, row_id) -> Optional[RowState]:
+        state = self._active.get(row_id)
+        return state if state is not None else self._terminal.get(row_id)
+
+    def put(self, row_id, state: RowState):
+        self._active.pop(row_id, None)
+        self._terminal.pop(row_id, None)
+        if self.is_terminal(state):
+            self._terminal[row_id] = state
+            while len(self._terminal) > self.max_terminal:
+                self._terminal.popitem(last=False)
+                state_evictions_total.inc(self.table, "terminal")
+        else:
+            self._active[row_id] = state
+            while len(self._active) > self.max_active:
+                self._active.popitem(last=False)
+                state_evictions_total.inc(self.table, "active")
+
+    def sizes(self):
+        return len(self._active), len(self._terminal)
+
+
+def _request_terminal(state: RowState) -> bool:
+    return state.status in ("ACCEPTED", "REJECTED")
+
+
+def _contract_terminal(state: RowState) -> bool:
+    return state.status == "REJECTED" or bool(state.flags & COMPLETED_READY)
+
+
+states = {
+    "contract_requests": StateIndex("contract_requests", _request_terminal, STATE_MAX_ACTIVE, STATE_MAX_TERMINAL),
+    "contracts": StateIndex("contracts", _contract_terminal, STATE_MAX_ACTIVE, STATE_MAX_TERMINAL),
+}
+
+CallbackMetric(
+    "livin_state_index_rows", "Rows tracked by the state index", "gauge",
+    lambda: {
+        (table, kind): size
+        for table, index in states.items()
+        for kind, size in zip(("active", "terminal"), index.sizes())
+    },
+    labels=["table", "kind"],
+)
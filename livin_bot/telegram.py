@@ -0,0 +1,340 @@
+"""Rate-limited Telegram delivery and message chunking."""
+
+import asyncio
+import heapq
+import json
+import os
+import re
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+import aiohttp
+
+from .config import CHAT_IDS, TOKEN
+from .metrics import (
+    CallbackMetric,
+    tg_dropped_total,
+    tg_responses_total,
+    tg_retries_total,
+    tg_send_seconds,
+)
+from .runtime import call_on_loop
+
+
+# ===================================
+# Telegram
+# ===================================
+
+# overridable so a local stub can stand in for Telegram (see bench/)
+TG_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+TG_URL = f"{TG_API_URL}/bot{TOKEN}/sendMessage"
+
+# Telegram limits: ~30 messages/s per bot, ~1 message/s per chat,
+# ~20 messages/min per group (negative chat ids)
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", 25))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", 1))
+TG_GROUP_PER_MINUTE = float(os.getenv("TG_GROUP_PER_MINUTE", 20))
+# concurrent HTTP requests (one keep-alive connection each)
+TG_SEND_WORKERS = int(os.getenv("TG_SEND_WORKERS", 4))
+TG_MAX_ATTEMPTS = 3
+# log a warning when this many messages are waiting
+TG_QUEUE_WARN_DEPTH = int(os.getenv("TG_QUEUE_WARN_DEPTH", 50))
+
+PRIORITY_HIGH = 0     # payment failures
+PRIORITY_NORMAL = 1   # routine updates, daily report
+
+
+class TokenBucket:
+    """Classic token bucket; used from the event loop thread only."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class OutboundQueue:
+    """
+    Background Telegram sender running on the event loop.
+
+    Messages wait in a per-chat heap ordered by (priority, enqueue order).
+    The dispatcher starts a delivery task for the best ready message,
+    respecting a global and a per-chat token bucket, one in-flight request
+    per chat (keeps order) and the chat's pause after a 429 retry_after or
+    a failed attempt. put() is safe to call from any thread and never
+    blocks on the network.
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, list] = {}       # chat_id -> heap of [priority, seq, text, attempt]
+        self._busy = set()                         # chats with a request in flight
+        self._paused_until: Dict[int, float] = {}  # chat_id -> monotonic time
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._global = TokenBucket(TG_GLOBAL_RATE, TG_GLOBAL_RATE)
+        self._seq = 0
+        self._depth = 0
+        self._warned = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+
+    def depth(self) -> int:
+        return self._depth
+
+    def start(self):
+        """Must be called from the running event loop."""
+        self._wakeup = asyncio.Event()
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=TG_SEND_WORKERS, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def drain(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while self._depth and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, *self._inflight, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+
+    def put(self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL):
+        call_on_loop(self._put, chat_id, text, priority)
+
+    def _put(self, chat_id: int, text: str, priority: int):
+        self._seq += 1
+        heapq.heappush(self._pending.setdefault(chat_id, []), [priority, self._seq, text, 0])
+        self._depth += 1
+        if self._depth >= TG_QUEUE_WARN_DEPTH and not self._warned:
+            self._warned = True
+            print(f"Telegram queue depth {self._depth}")
+        self._wakeup.set()
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if chat_id < 0:
+                bucket = TokenBucket(TG_GROUP_PER_MINUTE / 60, 1)
+            else:
+                bucket = TokenBucket(TG_CHAT_RATE, 1)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _pick(self, now: float):
+        """(chat_id, item) to send now, or (None, seconds to wait)."""
+        best = None
+        wait = None
+        for chat_id, heap in self._pending.items():
+            if not heap or chat_id in self._busy:
+                continue
+            chat_wait = max(self._paused_until.get(chat_id, 0) - now, self._bucket(chat_id).wait_time(now))
+            if chat_wait > 0:
+                wait = chat_wait if wait is None else min(wait, chat_wait)
+            elif best is None or heap[0][:2] < self._pending[best][0][:2]:
+                best = chat_id
+
+        if best is None:
+            return None, wait
+
+        global_wait = self._global.wait_time(now)
+        if global_wait > 0:
+            return None, global_wait
+
+        self._global.consume()
+        self._bucket(best).consume()
+        self._busy.add(best)
+        return best, heapq.heappop(self._pending[best])
+
+    async def _run(self):
+        while True:
+            chat_id, item = self._pick(time.monotonic())
+            if chat_id is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=item)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._deliver(chat_id, item))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, chat_id: int, item: list):
+        status = None
+        retry_in = None
+        try:
+            with tg_send_seconds.time():
+                async with self._session.post(
+                    TG_URL,
+                    json={
+                        "chat_id": chat_id,
+                        "text": item[2],
+                        "parse_mode": "HTML",
+                        "disable_web_page_preview": True,
+                    },
+                ) as r:
+                    status = r.status
+                    body = await r.text()
+            tg_responses_total.inc(str(status))
+            if status == 429:
+                try:
+                    retry_in = float(json.loads(body).get("parameters", {}).get("retry_after", 1))
+                except Exception:
+                    retry_in = 1.0
+                print(f"Telegram 429 for chat {chat_id}, retry after {retry_in:g}s")
+            elif status >= 500:
+                print(f"Telegram status {status}: {body[:200]}")
+                item[3] += 1
+                retry_in = float(item[3])
+            elif status != 200:
+                # 4xx (bad markup, bot blocked, ...) will not get better on retry
+                tg_dropped_total.inc()
+                print(f"Telegram status {status} for chat {chat_id}, dropped: {body[:200]}")
+        except Exception as e:
+            tg_responses_total.inc("error")
+            print(f"Telegram error for chat {chat_id} (attempt {item[3]+1}):", e)
+            item[3] += 1
+            retry_in = float(item[3])
+
+        self._busy.discard(chat_id)
+        if retry_in is not None and item[3] < TG_MAX_ATTEMPTS:
+            tg_retries_total.inc("429" if status == 429 else "error")
+            self._paused_until[chat_id] = time.monotonic() + retry_in
+            heapq.heappush(self._pending[chat_id], item)
+        else:
+            if retry_in is not None:
+                tg_dropped_total.inc()
+                print(f"Telegram send failed for chat {chat_id} after retries")
+            self._depth -= 1
+            if self._warned and self._depth == 0:
+                self._warned = False
+                print("Telegram queue drained")
+        self._wakeup.set()
+
+
+outbound = OutboundQueue()
+
+CallbackMetric(
+    "livin_telegram_queue_depth", "Messages waiting to be sent", "gauge",
+    lambda: {(): outbound.depth()},
+)
+
+
+def send(text: str, priority: int = PRIORITY_NORMAL, chats: Optional[Iterable[int]] = None):
+    """
+    Enqueues text for `chats` (default: every chat) and returns immediately;
+    delivery is rate limited and retried in the background by `outbound`.
+    Never raises (to avoid crashing the process).
+    """
+    text = (text or "").strip()
+    if not text:
+        return
+
+    for chat_id in (CHAT_IDS if chats is None else chats):
+        try:
+            outbound.put(chat_id, text, priority)
+        except Exception as e:
+            print(f"Telegram queue error for chat {chat_id}:", e)
+
+
+# Telegram rejects messages longer than this
+TG_MESSAGE_LIMIT = 4096
+
+
+def tg_len(text: str) -> int:
+    """
+    Length as Telegram counts it (UTF-16 code units). Measured on the raw
+    HTML, which is never shorter than the rendered text.
+    """
+    return len(text.encode("utf-16-le")) // 2
+
+
+# a tag, an entity or a single character: the units a line may be cut between
+_HTML_TOKEN_RE = re.compile(r"<[^>]*>|&#?\w+;|.", re.S)
+_TAG_NAME_RE = re.compile(r"</?([\w-]+)")
+
+
+def split_html(line: str, limit: int) -> List[str]:
+    """
+    Cuts one line of Telegram HTML into pieces of at most `limit` UTF-16
+    units. Tags and entities are never cut; the tags open at a cut are
+    closed at the end of the piece and reopened at the start of the next.
+    """
+    pieces = []
+    stack = []  # (name, opening tag) of the tags open so far
+    piece, piece_len, has_text = "", 0, False
+    for token in _HTML_TOKEN_RE.findall(line):
+        after = stack
+        if token.startswith("</"):
+            if stack and stack[-1][0] == _TAG_NAME_RE.match(token).group(1):
+                after = stack[:-1]
+        elif token.startswith("<") and _TAG_NAME_RE.match(token):
+            after = stack + [(_TAG_NAME_RE.match(token).group(1), token)]
+        token_len = tg_len(token)
+        closers_len = sum(len(name) + 3 for name, _ in after)
+        if has_text and piece_len + token_len + closers_len > limit:
+            pieces.append(piece + "".join(f"</{name}>" for name, _ in reversed(stack)))
+            piece = "".join(tag for _, tag in stack)
+            piece_len, has_text = tg_len(piece), False
+        piece += token
+        piece_len += token_len
+        has_text = True
+        stack = after
+    pieces.append(piece)
+    return pieces
+
+
+class MessageChunker:
+    """
+    Packs blocks of HTML into Telegram-sized messages and passes each full
+    message to `emit` right away. Blocks are whole lines with balanced tags,
+    so a message never ends inside a tag; a block longer than the limit is
+    split on its line boundaries, and a longer line by split_html.
+    """
+
+    def __init__(self, emit: Callable[[str], None], limit: int = TG_MESSAGE_LIMIT):
+        self.emit = emit
+        self.limit = limit
+        self._buf = ""
+        self._buf_len = 0
+
+    def add(self, block: str):
+        if tg_len(block) > self.limit:
+            for line in block.splitlines(keepends=True):
+                self._add(line)
+        else:
+            self._add(block)
+
+    def _add(self, block: str):
+        block_len = tg_len(block)
+        if self._buf_len + block_len > self.limit:
+            self.flush()
+        if block_len > self.limit:
+            # a single line longer than the limit cannot be kept whole
+            *full, block = split_html(block, self.limit)
+            for piece in full:
+                self.emit(piece)
+            block_len = tg_len(block)
+        self._buf += block
+        self._buf_len += block_len
+
+    def flush(self):
+        if self._buf.strip():
+            self.emit(self._buf)
+        self._buf = ""
+        self._buf_len = 0
@@ -1,740 +1,11 @@
-import time
-import os
-import threading
-from datetime import timedelta, datetime, timezone
-from typing import List, Callable, Any, Optional
+"""Entry point kept for `python main.py` deployments; the bot lives in livin_bot/."""
 
-import psycopg2
-import requests
 from dotenv import load_dotenv
-import pytz
 
+if __name__ == "__main__":
+    # before the package modules read their settings
+    load_dotenv()
 
-load_dotenv()
+    from livin_bot.app import main
 
-# ===================================
-# ENV
-# ===================================
-
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
-# Токен бота, который отвечает за брони
-TOKEN = os.getenv("TELEGRAM_BOOKING_BOT_TOKEN") or os.getenv("TELEGRAM_BOT_TOKEN")
-
-CHAT_IDS_RAW = (
-    os.getenv("TELEGRAM_BOOKING_CHAT_IDS")
-    or os.getenv("TELEGRAM_CHAT_IDS")
-    or os.getenv("TELEGRAM_CHAT_ID")
-    or ""
-)
-
-CHAT_IDS: List[int] = []
-for part in CHAT_IDS_RAW.replace(" ", "").split(","):
-    if part:
-        try:
-            CHAT_IDS.append(int(part))
-        except ValueError:
-            pass
-
-if not CHAT_IDS:
-    raise RuntimeError("Не указаны TELEGRAM_BOOKING_CHAT_IDS/TELEGRAM_CHAT_IDS/TELEGRAM_CHAT_ID в .env")
-
-CHECK_INTERVAL = int(os.getenv("CHECK_INTERVAL", 10))
-
-ALMATY_TZ = pytz.timezone("Asia/Almaty")
-
-# ===================================
-# Telegram
-# ===================================
-
-TG_URL = f"https://api.telegram.org/bot{TOKEN}/sendMessage"
-
-
-def send(text: str):
-    """
-    Telegram send with retries + timeouts.
-    Never raises (to avoid crashing the process).
-    """
-    text = (text or "").strip()
-    if not text:
-        return
-
-    for chat_id in CHAT_IDS:
-        ok = False
-        for attempt in range(3):
-            try:
-                r = requests.post(
-                    TG_URL,
-                    json={
-                        "chat_id": chat_id,
-                        "text": text,
-                        "parse_mode": "HTML",
-                        "disable_web_page_preview": True,
-                    },
-                    timeout=10,
-                )
-                if r.status_code == 200:
-                    ok = True
-                    break
-                else:
-                    print(f"Telegram status {r.status_code}: {r.text[:200]}")
-            except Exception as e:
-                print(f"Telegram error for chat {chat_id} (attempt {attempt+1}):", e)
-
-            time.sleep(1 + attempt)
-
-        if not ok:
-            print(f"Telegram send failed for chat {chat_id} after retries")
-
-
-# ===================================
-# DB Connection helper (reconnect + retry)
-# ===================================
-
-DB_CONN = (
-    f"host={DB_HOST} "
-    f"port={DB_PORT} "
-    f"dbname={DB_NAME} "
-    f"user={DB_USER} "
-    f"password={DB_PASSWORD} "
-    # keepalive helps with idle SSL drops; connect_timeout avoids hanging
-    f"connect_timeout=10 "
-    f"keepalives=1 keepalives_idle=30 keepalives_interval=10 keepalives_count=5"
-)
-
-
-def with_db(fn: Callable[[Any], Any], *, retries: int = 5):
-    """
-    Runs fn(cur) with a fresh DB connection.
-    Retries on OperationalError with exponential backoff.
-    Closes connection every time to avoid stale SSL sessions.
-    """
-    backoff = 1
-    last_err: Optional[Exception] = None
-
-    for attempt in range(retries):
-        conn = None
-        try:
-            conn = psycopg2.connect(DB_CONN)
-            conn.autocommit = True
-            cur = conn.cursor()
-            return fn(cur)
-        except psycopg2.OperationalError as e:
-            last_err = e
-            print(f"DB OperationalError (attempt {attempt+1}/{retries}): {e}")
-            time.sleep(backoff)
-            backoff = min(backoff * 2, 15)
-        except Exception as e:
-            # other DB errors: don't crash, retry a bit
-            last_err = e
-            print(f"DB error (attempt {attempt+1}/{retries}): {e}")
-            time.sleep(backoff)
-            backoff = min(backoff * 2, 15)
-        finally:
-            try:
-                if conn is not None:
-                    conn.close()
-            except Exception:
-                pass
-
-    raise last_err if last_err else RuntimeError("DB error: unknown")
-
-
-# ===================================
-# Helpers
-# ===================================
-
-def now_utc():
-    return datetime.now(timezone.utc)
-
-
-def to_almaty(dt):
-    if not dt:
-        return "-"
-    return dt.astimezone(ALMATY_TZ).strftime("%d.%m.%Y %H:%M")
-
-
-def fmt_date(d):
-    if not d:
-        return "-"
-    return d.strftime("%d.%m.%Y")
-
-
-def format_price(cost):
-    # cost / 100 * 1.12
-    return round(cost / 100 * 1.12)
-
-
-def today_almaty():
-    return datetime.now(ALMATY_TZ).date()
-
-
-def yesterday_almaty():
-    return today_almaty() - timedelta(days=1)
-
-
-def get_user_info(cur, user_id):
-    if not user_id:
-        return {"name": "—", "phone": "—"}
-    try:
-        cur.execute(
-            """
-            SELECT "firstName", "lastName", phone
-            FROM users
-            WHERE id = %s LIMIT 1;
-            """,
-            (user_id,),
-        )
-        row = cur.fetchone()
-        if not row:
-            return {"name": "—", "phone": "—"}
-        first, last, phone = row
-        full_name = f"{first or ''} {last or ''}".strip() or "—"
-        return {"name": full_name, "phone": phone or "—"}
-    except Exception as e:
-        print("get_user_info error:", e)
-        return {"name": "—", "phone": "—"}
-
-
-def extract_person(info_json, cur=None, fallback_user_id=None):
-    """
-    info_json: {"firstName","lastName","phoneNumber"/"phone", ...}
-    """
-    name = "—"
-    phone = "—"
-
-    if isinstance(info_json, dict):
-        first = info_json.get("firstName") or ""
-        last = info_json.get("lastName") or ""
-        full = f"{first} {last}".strip()
-        if full:
-            name = full
-        phone = info_json.get("phoneNumber") or info_json.get("phone") or "—"
-
-    # if json is incomplete — try users table
-    if cur is not None and fallback_user_id and (name == "—" or phone == "—"):
-        u = get_user_info(cur, fallback_user_id)
-        if name == "—":
-            name = u["name"]
-        if phone == "—":
-            phone = u["phone"]
-
-    return {"name": name, "phone": phone}
-
-
-def get_apartment_link(cur, apartment_id):
-    if not apartment_id:
-        return ""
-    try:
-        cur.execute(
-            """
-            SELECT slug
-            FROM apartment_identificator
-            WHERE "apartmentId" = %s
-            ORDER BY "createdAt" DESC
-            LIMIT 1;
-            """,
-            (apartment_id,),
-        )
-        row = cur.fetchone()
-        if not row or not row[0]:
-            return ""
-        slug = row[0]
-        return f"https://livin.kz/apartment/{slug}"
-    except Exception as e:
-        print("get_apartment_link error:", e)
-        return ""
-
-
-# ===================================
-# Daily report
-# ===================================
-
-def daily_report():
-    def _run(cur):
-        today = today_almaty()
-        yesterday = yesterday_almaty()
-
-        # ---------- 1) БРОНИРОВАНИЯ ЗА ВЧЕРА ----------
-        cur.execute(
-            """
-            SELECT id, cost, "arrivalDate", "departureDate", "baseApartmentAdData",
-                   "tenantInformation", "landlordInformation", "apartmentAdId", "payedAt"
-            FROM contracts
-            WHERE status = 'CONCLUDED'
-              AND "isPaymentSuccess" = true
-              AND "payedAt" IS NOT NULL
-            """
-        )
-        rows = cur.fetchall()
-
-        bookings_yesterday = []
-        for row in rows:
-            payed_at = row[8]
-            if payed_at and payed_at.astimezone(ALMATY_TZ).date() == yesterday:
-                bookings_yesterday.append(row)
-
-        # ---------- 2) ЗАЕЗДЫ СЕГОДНЯ ----------
-        cur.execute(
-            """
-            SELECT id, cost, "arrivalDate", "departureDate", "baseApartmentAdData",
-                   "tenantInformation", "landlordInformation", "apartmentAdId"
-            FROM contracts
-            WHERE status = 'CONCLUDED'
-              AND "isPaymentSuccess" = true
-            """
-        )
-        rows2 = cur.fetchall()
-
-        arrivals_today = []
-        payouts_today = []
-        total_payout = 0
-
-        for row in rows2:
-            (cid, cost, arr, dep, ad, tenant_info, landlord_info, ap_id) = row
-
-            if arr and arr.astimezone(ALMATY_TZ).date() == today:
-                arrivals_today.append(row)
-
-            # ---------- 3) ВЫПЛАТЫ СЕГОДНЯ ----------
-            if arr and (arr.astimezone(ALMATY_TZ).date() + timedelta(days=1) == today):
-                contract_sum = round(cost / 100)          # сумма контракта (без 1.12)
-                payout_sum = round(contract_sum * 0.97)   # минус 3%
-                payouts_today.append((row, payout_sum))
-                total_payout += payout_sum
-
-        # ---------- Message ----------
-        msg = f"📊 <b>Ежедневная сводка за {yesterday.strftime('%d.%m.%Y')}</b>\n\n"
-        msg += f"📌 <b>Бронирований за вчера:</b> {len(bookings_yesterday)}\n\n"
-
-        msg += "🏨 <b>Предстоящие заезды сегодня:</b>\n"
-        if arrivals_today:
-            for idx, row in enumerate(arrivals_today, 1):
-                (cid, cost, arr, dep, ad, tenant_info, landlord_info, ap_id) = row
-                ad_title = (ad or {}).get("title", "Квартира")
-                city = (ad or {}).get("address", {}).get("city", "")
-
-                tenant = extract_person(tenant_info)
-                landlord = extract_person(landlord_info)
-                price = format_price(cost)
-                link = get_apartment_link(cur, ap_id)
-                link_line = f'\n      🔗 <a href="{link}">Открыть объявление</a>' if link else ""
-
-                msg += (
-                    f"{idx}) <b>{ad_title}</b> — {city}\n"
-                    f"   👤 Гость: <b>{tenant['name']}</b>  | 📞 {tenant['phone']}\n"
-                    f"   🏡 Собственник: <b>{landlord['name']}</b>  | 📞 {landlord['phone']}\n"
-                    f"   📅 Даты: {fmt_date(arr)} → {fmt_date(dep)}\n"
-                    f"   💰 Цена: <b>{price:,} ₸</b>{link_line}\n\n"
-                )
-        else:
-            msg += "— нет заездов сегодня\n\n"
-
-        msg += "💵 <b>Выплаты сегодня:</b>\n"
-        if payouts_today:
-            for idx, (row, payout_sum) in enumerate(payouts_today, 1):
-                (cid, cost, arr, dep, ad, tenant_info, landlord_info, ap_id) = row
-                ad_title = (ad or {}).get("title", "Квартира")
-                city = (ad or {}).get("address", {}).get("city", "")
-
-                landlord = extract_person(landlord_info)
-                msg += (
-                    f"{idx}) <b>{ad_title}</b> — {city}\n"
-                    f"   🏡 Собственник: <b>{landlord['name']}</b>  | 📞 {landlord['phone']}\n"
-                    f"   Сумма: <b>{payout_sum:,} ₸</b>\n"
-                )
-            msg += f"\n💰 <b>Итого выплат:</b> {total_payout:,} ₸\n"
-        else:
-            msg += "— сегодня выплат нет\n"
-
-        send(msg)
-
-    try:
-        with_db(_run)
-    except Exception as e:
-        print("Daily report error:", e)
-
-
-def schedule_daily_report():
-    while True:
-        now = datetime.now(ALMATY_TZ)
-        target = now.replace(hour=9, minute=0, second=0, microsecond=0)
-
-        if now > target:
-            target += timedelta(days=1)
-
-        sleep_sec = (target - now).total_seconds()
-        time.sleep(sleep_sec)
-
-        daily_report()
-
-
-def send_missed_report_on_start():
-    # If bot starts after 09:00 Almaty — send yesterday report immediately.
-    # Without DB-state this can duplicate on multiple restarts, but prevents missing.
-    now = datetime.now(ALMATY_TZ)
-    if now.hour >= 9:
-        print("Startup: after 09:00, sending daily report (catch-up)")
-        daily_report()
-
-
-# ===================================
-# MAIN LOOP
-# ===================================
-
-print("Booking notifier started...")
-
-send_missed_report_on_start()
-threading.Thread(target=schedule_daily_report, daemon=True).start()
-
-last_request_mark = None   # for contract_requests
-last_contract_mark = None  # for contracts
-
-
-while True:
-    try:
-        def _iteration(cur):
-            global last_request_mark, last_contract_mark
-
-            # =====================================================
-            # 1) contract_requests (заявки)
-            # =====================================================
-            cur.execute(
-                """
-                SELECT 
-                    r.id,
-                    r.status,
-                    r.cost,
-                    r."arrivalDate",
-                    r."departureDate",
-                    r."baseApartmentAdData",
-                    r."tenantId",
-                    r."tenantInformation",
-                    r."landlordInformation",
-                    r."apartmentAdId",
-                    r."createdAt",
-                    r."updatedAt"
-                FROM contract_requests r
-                ORDER BY r."updatedAt" DESC
-                LIMIT 1;
-                """
-            )
-            req = cur.fetchone()
-
-            if req:
-                (
-                    req_id,
-                    status,
-                    cost,
-                    arrival,
-                    departure,
-                    ad_info,
-                    tenant_id,
-                    tenant_info_json,
-                    landlord_info_json,
-                    apartment_ad_id,
-                    created_at,
-                    updated_at,
-                ) = req
-
-                current_mark = f"{req_id}:{status}"
-                if last_request_mark is None:
-                    last_request_mark = current_mark
-                elif current_mark != last_request_mark:
-                    ad_title = (ad_info or {}).get("title", "Квартира")
-                    city = (ad_info or {}).get("address", {}).get("city", "")
-
-                    tenant = extract_person(tenant_info_json, cur=cur, fallback_user_id=tenant_id)
-                    landlord = extract_person(landlord_info_json)
-
-                    price = format_price(cost)
-                    link = get_apartment_link(cur, apartment_ad_id)
-                    link_line = f'\n🔗 <a href="{link}">Открыть объявление</a>' if link else ""
-
-                    if status == "CREATED":
-                        send(f"""
-✉️ <b>Заявка отправлена</b>
-🕒 Создано: <b>{to_almaty(created_at)}</b>
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-🏠 Квартира: <b>{ad_title}</b>
-🌆 {city}
-
-📅 {fmt_date(arrival)} → {fmt_date(departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                    elif status == "ACCEPTED":
-                        send(f"""
-✅ <b>Заявка принята собственником</b>
-🕒 Создано: <b>{to_almaty(created_at)}</b>
-🕒 Обновлено: <b>{to_almaty(updated_at)}</b>
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-🏠 Квартира: <b>{ad_title}</b>
-🌆 {city}
-
-📅 {fmt_date(arrival)} → {fmt_date(departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                    elif status == "REJECTED":
-                        send(f"""
-❌ <b>Заявка отклонена</b>
-🕒 Создано: <b>{to_almaty(created_at)}</b>
-🕒 Обновлено: <b>{to_almaty(updated_at)}</b>
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-🏠 Квартира: <b>{ad_title}</b>
-🌆 {city}
-
-📅 {fmt_date(arrival)} → {fmt_date(departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                    last_request_mark = current_mark
-
-            # =====================================================
-            # 2) contracts (оплаченные / активные / завершённые)
-            # =====================================================
-            cur.execute(
-                """
-                SELECT
-                    c.id,
-                    c.status,
-                    c.cost,
-                    c."arrivalDate",
-                    c."departureDate",
-                    c."baseApartmentAdData",
-                    c."tenantId",
-                    c."landlordId",
-                    c."tenantInformation",
-                    c."landlordInformation",
-                    c."apartmentAdId",
-                    c."createdAt",
-                    c."updatedAt",
-                    c."isPaymentSuccess",
-                    c."payedAt",
-                    c."retryPaymentAttempts"
-                FROM contracts c
-                ORDER BY c."updatedAt" DESC
-                LIMIT 1;
-                """
-            )
-            contract = cur.fetchone()
-
-            if contract:
-                (
-                    c_id,
-                    c_status,
-                    c_cost,
-                    c_arrival,
-                    c_departure,
-                    c_ad,
-                    tenant_id,
-                    landlord_id,
-                    c_tenant_info,
-                    c_landlord_info,
-                    c_apartment_ad_id,
-                    c_created,
-                    c_updated,
-                    c_is_payment_success,
-                    c_payed_at,
-                    c_retry_payment_attempts,
-                ) = contract
-
-                c_retry_payment_attempts = c_retry_payment_attempts or 0
-
-                completed_ready = int(
-                    c_status == "COMPLETED"
-                    and c_departure is not None
-                    and now_utc() >= c_departure
-                )
-
-                current_mark = (
-                    f"{c_id}:"
-                    f"{c_status}:"
-                    f"{int(bool(c_is_payment_success))}:"
-                    f"{int(bool(c_payed_at))}:"
-                    f"{int(c_retry_payment_attempts)}:"
-                )
-                if c_status == "COMPLETED":
-                    current_mark += f"{int(completed_ready)}"
-
-                if last_contract_mark is None:
-                    last_contract_mark = current_mark
-                elif current_mark != last_contract_mark:
-
-                    # OFFERING skip
-                    if c_status == "OFFERING":
-                        last_contract_mark = current_mark
-                        return
-
-                    tenant = extract_person(c_tenant_info, cur=cur, fallback_user_id=tenant_id)
-                    landlord = extract_person(c_landlord_info, cur=cur, fallback_user_id=landlord_id)
-
-                    title = (c_ad or {}).get("title", "Квартира")
-                    city = (c_ad or {}).get("address", {}).get("city", "")
-                    price = format_price(c_cost)
-                    link = get_apartment_link(cur, c_apartment_ad_id)
-                    link_line = f'\n🔗 <a href="{link}">Открыть объявление</a>' if link else ""
-
-                    if c_status == "CREATED":
-                        send(f"""
-📄 <b>Контракт создан</b>
-🕒 {to_almaty(c_created)}
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-🏠 {title}
-🌆 {city}
-
-📅 {fmt_date(c_arrival)} → {fmt_date(c_departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                    elif c_status == "CONCLUDED":
-                        if c_is_payment_success and c_payed_at:
-                            send(f"""
-💳 <b>Бронь оплачена</b>
-🕒 Создано: <b>{to_almaty(c_created)}</b>
-🕒 Оплачено: <b>{to_almaty(c_payed_at)}</b>
-
-🏠 {title}
-🌆 {city}
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-📅 {fmt_date(c_arrival)} → {fmt_date(c_departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                        elif (not c_is_payment_success) and c_retry_payment_attempts == 0:
-                            send(f"""
-💥 <b>Оплата не прошла</b>
-Первая попытка списания после принятия заявки закончилась неуспешно.
-
-🏠 {title}
-🌆 {city}
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-📅 {fmt_date(c_arrival)} → {fmt_date(c_departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                        elif (not c_is_payment_success) and c_retry_payment_attempts >= 1:
-                            send(f"""
-💥 <b>Повторная оплата не прошла</b>
-Попыток оплаты: <b>{c_retry_payment_attempts}</b>
-
-🏠 {title}
-🌆 {city}
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-📅 {fmt_date(c_arrival)} → {fmt_date(c_departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                    elif c_status == "COMPLETED":
-                        if completed_ready:
-                            send(f"""
-🏁 <b>Проживание завершено</b>
-🕒 {to_almaty(c_updated)}
-
-🏠 {title}
-🌆 {city}
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-📅 {fmt_date(c_arrival)} → {fmt_date(c_departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                    elif c_status == "REJECTED":
-                        send(f"""
-❌ <b>Контракт отменён</b>
-🕒 {to_almaty(c_updated)}
-
-🏠 {title}
-🌆 {city}
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-📅 {fmt_date(c_arrival)} → {fmt_date(c_departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                    elif c_status == "FREEZE":
-                        send(f"""
-🧊 <b>Контракт заморожен</b>
-🕒 {to_almaty(c_updated)}
-
-ID: {c_id}
-
-🏠 {title}
-🌆 {city}
-
-👤 Гость: <b>{tenant['name']}</b>
-📞 {tenant['phone']}
-
-🏡 Собственник: <b>{landlord['name']}</b>
-📞 {landlord['phone']}
-
-📅 {fmt_date(c_arrival)} → {fmt_date(c_departure)}
-💰 Цена: <b>{price:,} ₸</b>{link_line}
-""")
-
-                    last_contract_mark = current_mark
-
-        with_db(_iteration, retries=3)
-
-    except Exception as e:
-        # Never crash the process (avoid Railway restarts due to unhandled exceptions)
-        print("Main loop error:", e)
-
-    time.sleep(CHECK_INTERVAL)
\ No newline at end of file
+    main()
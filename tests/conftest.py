@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# keep the checkpoint store out of the working tree
+os.environ.setdefault("CHECKPOINT_PATH", os.path.join(tempfile.mkdtemp(prefix="livin-tests-"), "checkpoints.sqlite3"))
@@ -0,0 +1,53 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+
+from livin_bot import aggregates
+from livin_bot.checkpoints import CheckpointStore
+from livin_bot.config import ALMATY_TZ
+from livin_bot.helpers import today_almaty
+
+
+@pytest.fixture
+def agg(monkeypatch, tmp_path):
+    monkeypatch.setattr(aggregates, "checkpoints", CheckpointStore(str(tmp_path / "cp.sqlite3")))
+    monkeypatch.setattr(aggregates, "get_apartment_link", lambda cur, ap_id: "")
+    return aggregates.DailyAggregates()
+
+
+def at(day_offset, hour=12):
+    day = today_almaty() + timedelta(days=day_offset)
+    return ALMATY_TZ.localize(datetime.combine(day, time(hour)))
+
+
+def observe(agg, cid, status="CONCLUDED", paid=True, payed_at=None, arrival=None):
+    departure = arrival and arrival + timedelta(days=2)
+    agg.observe(None, cid, status, 100000, arrival, departure, "Квартира", "Алматы",
+                ("Гость", "+7"), ("Хозяин", "+7"), "ad", paid, payed_at)
+
+
+def test_paid_contract_counts_as_booking_and_arrival(agg):
+    observe(agg, "c1", payed_at=at(-1), arrival=at(0, 14))
+    bookings, _ = agg.snapshot(at(-1).date().isoformat())
+    _, arrivals = agg.snapshot(at(0).date().isoformat())
+    assert bookings == 1
+    assert [a["title"] for a in arrivals] == ["Квартира"]
+
+
+def test_unpaid_change_removes_the_contract(agg):
+    observe(agg, "c1", payed_at=at(-1), arrival=at(0))
+    observe(agg, "c1", status="REJECTED", paid=False, payed_at=at(-1), arrival=at(0))
+    assert agg.snapshot(at(-1).date().isoformat())[0] == 0
+    assert agg.snapshot(at(0).date().isoformat())[1] == []
+
+
+def test_moved_arrival_leaves_the_old_day(agg):
+    observe(agg, "c1", payed_at=at(-1), arrival=at(0))
+    observe(agg, "c1", payed_at=at(-1), arrival=at(1))
+    assert agg.snapshot(at(0).date().isoformat())[1] == []
+    assert len(agg.snapshot(at(1).date().isoformat())[1]) == 1
+
+
+def test_days_outside_the_window_are_ignored(agg):
+    observe(agg, "c1", payed_at=at(-5), arrival=at(5))
+    assert all(agg.snapshot(day) == (0, []) for day in agg.window())
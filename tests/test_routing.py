@@ -0,0 +1,34 @@
+import pytest
+
+from livin_bot.routing import Router
+
+
+def test_unrouted_chat_gets_everything():
+    router = Router('{"1": {"events": ["paid"]}}', [1, 2]).compile()
+    assert router.chats_for("paid") == (1, 2)
+    assert router.chats_for("frozen") == (2,)
+
+
+def test_city_rule_matches_case_insensitively():
+    router = Router('{"1": {"cities": ["Алматы"]}}', [1, 2]).compile()
+    assert router.chats_for("paid", " алматы ") == (1, 2)
+    assert router.chats_for("paid", "Астана") == (2,)
+
+
+def test_daily_report_ignores_cities():
+    router = Router('{"1": {"cities": ["Алматы"]}}', [1]).compile()
+    assert router.chats_for("daily_report") == (1,)
+
+
+@pytest.mark.parametrize("raw", [
+    '["1"]',
+    '{"1": ["paid"]}',
+    '{"1": {"cities": "Алматы"}}',
+    '{"1": {"events": "paid"}}',
+    '{"1": {"events": ["paid", 3]}}',
+    '{"1": {"events": ["no_such_event"]}}',
+    '{"1": ',
+])
+def test_malformed_rules_raise_value_error(raw):
+    with pytest.raises(ValueError):
+        Router(raw, [1]).compile()
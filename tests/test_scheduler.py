@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+import pytest
+
+from livin_bot import scheduler
+from livin_bot.checkpoints import CheckpointStore
+from livin_bot.helpers import now_utc
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+
+@pytest.fixture
+def timers(monkeypatch, tmp_path):
+    monkeypatch.setattr(scheduler, "checkpoints", CheckpointStore(str(tmp_path / "cp.sqlite3")))
+    return scheduler.TimerScheduler(lambda cur, due: None)
+
+
+def test_load_schedules_due_timers(timers):
+    now = now_utc()
+    timers.load(FakeCursor([("c1", "CONCLUDED", True, now + timedelta(hours=3), now + timedelta(hours=5))]))
+    due, wait = timers._pop_due(now + timedelta(hours=1, minutes=1))
+    assert due == [("arrival_soon", "c1")]
+    due, _ = timers._pop_due(now + timedelta(hours=6))
+    assert due == [("completed", "c1")]
+    assert wait is not None
+
+
+def test_observe_moves_and_cancels(timers):
+    now = now_utc()
+    timers.load(FakeCursor([]))
+    timers.observe("c1", "CONCLUDED", True, None, now + timedelta(hours=2))
+    timers.observe("c1", "CONCLUDED", True, None, now + timedelta(hours=4))
+    due, _ = timers._pop_due(now + timedelta(hours=3))
+    assert due == []
+    timers.observe("c1", "CONCLUDED", False, None, now + timedelta(hours=4))  # no longer paid
+    due, wait = timers._pop_due(now + timedelta(hours=5))
+    assert due == [] and wait is None
+
+
+def test_unpaid_or_unknown_status_needs_no_timers():
+    now = now_utc()
+    assert scheduler.timer_due_times("CONCLUDED", False, now, now) == {}
+    assert scheduler.timer_due_times("REJECTED", True, now, now) == {}
+    assert "arrival_soon" not in scheduler.timer_due_times("COMPLETED", True, now, now)
@@ -0,0 +1,23 @@
+"""Startup-time budgets from bench/startup.py, run as part of the test suite."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+from startup import check_first_poll, check_import  # noqa: E402
+
+IMPORT_BUDGET = 1.0
+FIRST_POLL_BUDGET = 2.0
+
+
+def test_import_budget():
+    result = check_import()
+    assert "error" not in result, result.get("error")
+    assert result["seconds"] < IMPORT_BUDGET
+    assert result["threads"] == 1, "import started threads"
+    assert result["files"] == [], "import created files"
+
+
+def test_first_poll_budget():
+    result = check_first_poll(FIRST_POLL_BUDGET)
+    assert "error" not in result, result.get("error")
+    assert result["seconds"] < FIRST_POLL_BUDGET
@@ -0,0 +1,34 @@
+from livin_bot.state import RowState, StateIndex
+
+
+def make_index(max_active=2, max_terminal=2):
+    return StateIndex("t", lambda state: state.status == "DONE", max_active, max_terminal)
+
+
+def test_least_recently_changed_active_row_goes_first():
+    index = make_index()
+    index.put("a", RowState("NEW"))
+    index.put("b", RowState("NEW"))
+    index.put("a", RowState("OPEN"))
+    index.put("c", RowState("NEW"))
+    assert index.get("b") is None
+    assert index.get("a") == RowState("OPEN")
+    assert index.sizes() == (2, 0)
+
+
+def test_terminal_rows_never_push_out_active_ones():
+    index = make_index()
+    index.put("a", RowState("NEW"))
+    for row_id in "xyz":
+        index.put(row_id, RowState("DONE"))
+    assert index.get("a") == RowState("NEW")
+    assert index.get("x") is None
+    assert index.sizes() == (1, 2)
+
+
+def test_row_moves_between_maps():
+    index = make_index()
+    index.put("a", RowState("NEW"))
+    index.put("a", RowState("DONE"))
+    assert index.sizes() == (0, 1)
+    assert len(index) == 1
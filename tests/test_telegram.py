@@ -0,0 +1,39 @@
+import re
+
+from livin_bot.telegram import MessageChunker, split_html, tg_len
+
+
+def balanced(text):
+    opened = re.findall(r"<([\w-]+)", text)
+    closed = re.findall(r"</([\w-]+)>", text)
+    return sorted(opened) == sorted(closed)
+
+
+def test_short_line_is_kept_whole():
+    assert split_html("<b>hi</b>", 10) == ["<b>hi</b>"]
+
+
+def test_cut_closes_and_reopens_tags():
+    line = '<b>bold ' + "x&amp;y " * 30 + '</b> <a href="http://e/1">' + "link " * 20 + "</a>"
+    pieces = split_html(line, 40)
+    assert len(pieces) > 1
+    for piece in pieces:
+        assert tg_len(piece) <= 40
+        assert balanced(piece)
+        assert "&am" not in piece.replace("&amp;", "")
+    assert "".join(re.sub(r"</?[\w-]+[^>]*>", "", p) for p in pieces) == re.sub(r"</?[\w-]+[^>]*>", "", line)
+
+
+def test_cut_counts_utf16_units():
+    pieces = split_html("😀" * 30, 10)
+    assert [tg_len(p) for p in pieces] == [10, 10, 10, 10, 10, 10]
+
+
+def test_chunker_packs_blocks_up_to_the_limit():
+    out = []
+    chunker = MessageChunker(out.append, limit=20)
+    for _ in range(5):
+        chunker.add("<b>12345</b>\n")
+    chunker.flush()
+    assert all(tg_len(m) <= 20 for m in out)
+    assert "".join(out) == "<b>12345</b>\n" * 5
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+import pytest
+
+from livin_bot import feed
+from livin_bot.dal import ContractRow
+from livin_bot.helpers import now_utc
+from livin_bot.state import StateIndex, states
+
+
+def contract(cid="c1", status="CONCLUDED", departure_in=-timedelta(hours=1)):
+    now = now_utc()
+    return ContractRow(
+        cid, status, 100000, now - timedelta(days=2), now + departure_in, "Квартира", "Алматы",
+        "t", "l", "Гость", "+7", "Хозяин", "+7", "ad", now - timedelta(days=3), now,
+        True, now - timedelta(days=3), 0,
+    )
+
+
+@pytest.fixture
+def announced(monkeypatch):
+    events = []
+    monkeypatch.setattr(feed, "announce_contract", lambda cur, c, event, **kw: events.append(event))
+    monkeypatch.setitem(states, "contracts", StateIndex("contracts", lambda state: False, 100, 100))
+    return events
+
+
+def test_completed_timer_ignores_paid_contract_not_in_index(announced):
+    feed.TIMER_HANDLERS["completed"](None, contract(status="CONCLUDED"))
+    assert announced == []
+
+
+def test_completed_timer_waits_for_departure(announced):
+    feed.TIMER_HANDLERS["completed"](None, contract(status="COMPLETED", departure_in=timedelta(hours=1)))
+    assert announced == []
+
+
+def test_completed_timer_fires_once(announced):
+    row = contract(status="COMPLETED")
+    feed.TIMER_HANDLERS["completed"](None, row)
+    feed.TIMER_HANDLERS["completed"](None, row)
+    assert announced == ["completed"]
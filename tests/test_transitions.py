@@ -0,0 +1,39 @@
+from livin_bot.feed import contract_event, request_event
+from livin_bot.state import COMPLETED_READY, PAID, PAYED_AT, RowState
+
+
+def test_request_events():
+    assert request_event(None, RowState("CREATED")) == "request_created"
+    assert request_event(RowState("CREATED"), RowState("ACCEPTED")) == "request_accepted"
+    assert request_event(RowState("CREATED"), RowState("REJECTED")) == "request_rejected"
+    assert request_event(RowState("ACCEPTED"), RowState("ACCEPTED")) is None
+    assert request_event(None, RowState("DRAFT")) is None
+
+
+def test_contract_created_and_unseen_states():
+    assert contract_event(None, RowState("CREATED")) == "contract_created"
+    assert contract_event(None, RowState("OFFERING")) is None
+    assert contract_event(None, RowState("REJECTED")) == "contract_rejected"
+    assert contract_event(None, RowState("FREEZE")) == "frozen"
+
+
+def test_paid_waits_for_payed_at():
+    paid = RowState("CONCLUDED", PAID)
+    assert contract_event(RowState("CREATED"), paid) is None
+    assert contract_event(paid, RowState("CONCLUDED", PAID | PAYED_AT)) == "paid"
+    assert contract_event(RowState("CONCLUDED", PAID | PAYED_AT), RowState("CONCLUDED", PAID | PAYED_AT)) is None
+
+
+def test_every_failed_retry_is_announced():
+    assert contract_event(RowState("CREATED"), RowState("CONCLUDED")) == "payment_failed"
+    assert contract_event(RowState("CONCLUDED"), RowState("CONCLUDED", retries=1)) == "retry_failed"
+    assert contract_event(RowState("CONCLUDED", retries=1), RowState("CONCLUDED", retries=2)) == "retry_failed"
+    assert contract_event(RowState("CONCLUDED", retries=2), RowState("CONCLUDED", retries=2)) is None
+
+
+def test_completed_only_after_departure():
+    paid = RowState("CONCLUDED", PAID | PAYED_AT)
+    assert contract_event(paid, RowState("COMPLETED", PAID | PAYED_AT)) is None
+    ready = RowState("COMPLETED", PAID | PAYED_AT | COMPLETED_READY)
+    assert contract_event(RowState("COMPLETED", PAID | PAYED_AT), ready) == "completed"
+    assert contract_event(ready, ready) is None